@@ -1,31 +1,56 @@
 """Cleaning Utility for JSON files in a folder."""
-import json
 import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+import orjson
+from utils import load_json_obj, write_bytes_atomic
+
 
 def clean_json_file(file_path):
-    """Clean a JSON file by removing entries with "Page Status" set to "Page not found"."""
-    with Path(file_path).open(encoding="utf-8") as f:
-        data = json.load(f)
+    """
+    Clean a JSON file by removing entries with "Page Status" set to "Page not found".
+
+    Returns True if the file was cleaned, False if it was skipped because it is not a list of dicts.
+    """
+    path = Path(file_path)
+    if path.suffix == ".jsonl":
+        return _clean_jsonl_file(path)
+    data = load_json_obj(str(path))
 
     # Only clean if data is a list of dicts
     if isinstance(data, list) and all(isinstance(item, dict) for item in data):
         cleaned_data = [item for item in data if item.get("Page Status") != "Page not found"]
-        with Path(file_path).open("w", encoding="utf-8") as f:
-            json.dump(cleaned_data, f, indent=4)
-        print(f"Cleaned: {file_path}")
-    else:
-        print(f"Skipped (not a list of dicts): {file_path}")
-
-
-def clean_folder_recursive(folder_path):
-    """Recursively clean all JSON files in a folder."""
-    for root, _, files in os.walk(folder_path):
-        for file in files:
-            if file.endswith(".json"):
-                file_path = Path(root) / file
-                clean_json_file(file_path)
+        # Leave the file untouched when nothing was removed
+        if len(cleaned_data) != len(data):
+            write_bytes_atomic(orjson.dumps(cleaned_data, option=orjson.OPT_INDENT_2), path)
+        return True
+    return False
+
+
+def _clean_jsonl_file(path):
+    """Clean a JSON Lines report file, each line holding one entry."""
+    lines = [line for line in path.read_bytes().splitlines() if line.strip()]
+    data = [orjson.loads(line) for line in lines]
+    if not all(isinstance(item, dict) for item in data):
+        return False
+    kept_lines = [line for line, item in zip(lines, data, strict=True) if item.get("Page Status") != "Page not found"]
+    if len(kept_lines) != len(lines):
+        write_bytes_atomic(b"".join(line + b"\n" for line in kept_lines), path)
+    return True
+
+
+def clean_folder_recursive(folder_path, max_workers=None):
+    """Recursively clean all JSON files in a folder, spreading the files over a pool of processes."""
+    file_paths = [Path(root) / file for root, _, files in os.walk(folder_path) for file in files if file.endswith((".json", ".jsonl"))]
+
+    # The workers only return a flag, the parent prints so the output lines never interleave
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for file_path, cleaned in zip(file_paths, executor.map(clean_json_file, file_paths, chunksize=32), strict=True):
+            if cleaned:
+                print(f"Cleaned: {file_path}")
+            else:
+                print(f"Skipped (not a list of dicts): {file_path}")
 
 
 if __name__ == "__main__":
@@ -1,17 +1,19 @@
 """Main script to run the entire pipeline."""
 
-import json
 import logging
 import os
 import sys
-from concurrent.futures import ThreadPoolExecutor
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from pathlib import Path
 
+import orjson
 import pandas as pd
 from dotenv import load_dotenv
 from scraping.financial_source_finder import FinancialSourcesFinder
 from tqdm import tqdm
+from utils import load_json_obj
 
 logging.basicConfig(
     level=logging.INFO,
@@ -20,6 +22,17 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+REPORTS_DIR = Path("reports")
+# Reports kept per company, the companies having them all are not searched again
+MAX_REPORTS_PER_COMPANY = 6
+# Rows of the input CSV parsed at a time
+INPUT_CHUNK_SIZE = 10_000
+
+# The batches run in parallel and a company appears in several of them (one row per variable)
+_REPORTS_LOCK = threading.Lock()
+# Variables of the reports in each report file, guarded by `_REPORTS_LOCK`
+_report_variables: dict[Path, list] = {}
+
 
 def main():
     """Run the financial sources finder."""
@@ -30,10 +43,9 @@ def main():
     parser.add_argument("--output", default="financial_sources_results.csv", help="Output CSV file")
     parser.add_argument("--source-type", default="Annual Report", help="Type of financial source to search for")
     parser.add_argument("--api-key", help="Gemini API key (optional if set as an environment variable)")
-    parser.add_argument("--threads", type=int, default=4, help="Number of threads for parallel processing")
-    parser.add_argument("--batch-size", type=int, default=5, help="Batch size for processing")
-    parser.add_argument("--validation-threshold", type=int, default=80, help="Validation threshold (0-100)")
-    parser.add_argument("--max-tuning", type=int, default=3, help="Maximum number of tuning iterations")
+    parser.add_argument("--threads", type=int, default=16, help="Number of companies scraped in parallel")
+    parser.add_argument("--batch-size", type=int, default=5, help="Number of companies sent to the model in a single request")
+    parser.add_argument("--parallel-batches", type=int, default=4, help="Number of batches processed at the same time")
 
     args = parser.parse_args()
 
@@ -46,31 +58,56 @@ def main():
         logger.error("Gemini API key not provided. Set GOOGLE_API_KEY or use --api-key, if not created go to the official website: https://aistudio.google.com/apikey")
         sys.exit(1)
 
-    df = pd.read_csv(args.input, sep=";")
+    # Only the columns used, read in chunks so a large input is never loaded at once
+    reader = pd.read_csv(
+        args.input, sep=";", usecols=["ID", "NAME", "VARIABLE"], dtype={"NAME": "string", "VARIABLE": "category"}, chunksize=INPUT_CHUNK_SIZE
+    )
 
     # Initialize the finder
-    finder = FinancialSourcesFinder(api_key=api_key, max_tuning_iterations=args.max_tuning, validation_threshold=args.validation_threshold)
-
-    for row in tqdm(df.itertuples()):
-        company_name = row.NAME
-        variable = row.VARIABLE
-        company_name = company_name.replace("/", "_")
-
-        # Find the financial source
-        report_dir = Path("reports")
-        report_path = report_dir / f"{company_name.replace(' ', '_')}_report.json"
-        if report_path.exists():
-            with report_path.open("r", encoding="utf-8") as f:
-                data = json.load(f)
-            if isinstance(data, list) and len(data) > 5:
+    finder = FinancialSourcesFinder(api_key=api_key, max_workers=args.threads)
+
+    REPORTS_DIR.mkdir(parents=True, exist_ok=True)
+    pending = []
+    futures = []
+    with ThreadPoolExecutor(max_workers=args.parallel_batches) as executor:
+        # The three columns iterated as plain values, without building a row object each
+        rows = (row for df in reader for row in zip(df["ID"], df["NAME"], df["VARIABLE"], strict=True))
+        for row_id, company_name, variable in tqdm(rows):
+            company_name = company_name.replace("/", "_")
+
+            # Skip the complete companies and the variables already found before any request to the model or the web
+            with _REPORTS_LOCK:
+                saved_variables = existing_report_variables(report_path_for(company_name))
+            if len(saved_variables) >= MAX_REPORTS_PER_COMPANY:
                 logger.info("Skipping company %s as it already has more than five records.", company_name)
                 continue
+            if variable in saved_variables:
+                logger.info("Skipping company %s as it already has a record for the variable %s.", company_name, variable)
+                continue
+            pending.append((row_id, company_name, variable))
+
+            # The companies are sent to the model in batches of --batch-size, --parallel-batches at a time
+            if len(pending) >= args.batch_size:
+                futures.append(executor.submit(process_batch, finder, pending))
+                pending = []
+
+        if pending:
+            futures.append(executor.submit(process_batch, finder, pending))
+
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Batches"):
+            future.result()
+
+
+def process_batch(finder: FinancialSourcesFinder, batch: list[tuple]) -> None:
+    """Find the financial sources for a batch of (ID, company name, variable) and save the reports."""
+    for _, company_name, variable in batch:
         logger.info("Processing company: %s for the variable: %s", company_name, variable)
 
-        url, value, currency, refyear, page_status= finder.find_financial_source(company_name, variable)
-       # Generate reports for the company
+    results = finder.find_financial_sources_batch([(company_name, variable) for _, company_name, variable in batch])
+    for (row_id, company_name, variable), (url, value, currency, refyear, page_status) in zip(batch, results, strict=True):
+        # Generate reports for the company
         report = {
-            "ID": row.ID,
+            "ID": row_id,
             "NAME": company_name,
             "VARIABLE": variable,
             "VALUE": value,
@@ -78,32 +115,61 @@ def main():
             "REFYEAR": refyear,
             "SRC": url,
             "Page Status": page_status,
+        }
+        save_report(company_name, report)
 
 
-        }
-        # Save the report to a JSON file
-        
-        report_dir = Path("reports")
-        report_dir.mkdir(parents=True, exist_ok=True)
-        report_path = report_dir / f"{company_name.replace(' ', '_')}_report.json"
-        # Append the new report to the JSON file
+def report_path_for(company_name: str) -> Path:
+    """Return the path of the JSON Lines report file of the company."""
+    return REPORTS_DIR / f"{company_name.replace(' ', '_')}_report.jsonl"
+
+
+def existing_report_variables(report_path: Path) -> list:
+    """
+    Return the variables of the reports already saved in the file, one per report, `_REPORTS_LOCK` must be held.
+
+    The variables are read from the file once and then kept up to date by `save_report`. A JSON report
+    written by the previous versions is converted to JSON Lines first.
+    """
+    if report_path not in _report_variables:
+        _convert_legacy_report(report_path)
         if report_path.exists():
-            with report_path.open("r", encoding="utf-8") as f:
-                data = json.load(f)
-            if isinstance(data, list) and len(data) >= 6:
-                logger.info("Skipping company %s as it already has six or more records.", company_name)
-                continue
-            if isinstance(data, list):
-                data.append(report)
-            else:
-                data = [data, report]
+            with report_path.open("rb") as f:
+                _report_variables[report_path] = [orjson.loads(line).get("VARIABLE") for line in f if line.strip()]
         else:
-            data = [report]
-        
-        with report_path.open("w", encoding="utf-8") as f:
-            json.dump(data, f, indent=4)
-        logger.info("Report appended to %s", report_path)
-
+            _report_variables[report_path] = []
+    return _report_variables[report_path]
+
+
+def _convert_legacy_report(report_path: Path) -> None:
+    """Move the reports of the former `<company>_report.json` array file to the JSON Lines file."""
+    legacy_path = report_path.with_suffix(".json")
+    if not legacy_path.exists():
+        return
+    data = load_json_obj(str(legacy_path))
+    with report_path.open("ab") as f:
+        f.writelines(orjson.dumps(report) + b"\n" for report in (data if isinstance(data, list) else [data]))
+    legacy_path.unlink()
+
+
+def save_report(company_name: str, report: dict) -> None:
+    """Append the report to the JSON Lines file of the company, `REPORTS_DIR` must exist."""
+    report_path = report_path_for(company_name)
+    with _REPORTS_LOCK:
+        # Checked again under the lock, another batch may have appended to the file since the skip check
+        saved_variables = existing_report_variables(report_path)
+        if len(saved_variables) >= MAX_REPORTS_PER_COMPANY:
+            logger.info("Skipping company %s as it already has six or more records.", company_name)
+            return
+        # The same row may be processed twice in a run, its report is written once
+        if report["VARIABLE"] in saved_variables:
+            logger.info("Skipping company %s as it already has a record for the variable %s.", company_name, report["VARIABLE"])
+            return
+        # One line appended, the previous reports are neither read nor rewritten
+        with report_path.open("ab") as f:
+            f.write(orjson.dumps(report) + b"\n")
+        saved_variables.append(report["VARIABLE"])
+    logger.info("Report appended to %s", report_path)
 
 
 if __name__ == "__main__":
@@ -1,16 +1,34 @@
 """Prompt generator for financial data source finder."""
 
+import functools
+import hashlib
+import json
 import logging
-import secrets
+import os
+import random
+import re
+import string
 import sys
-import time
+import threading
+from collections import defaultdict
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse
 
 import google.generativeai as genai
-from google.api_core.exceptions import ResourceExhausted
+import orjson
 from google.generativeai.types import generation_types
-from prompts.base_prompt import base_prompt_template, web_scraping_prompt, base_prompt_improving
-from utils import load_config_yaml
+from model.response_cache import CachedResponse, ResponseCache
+from model.retry import generate_with_retry
+from prompts.base_prompt import (
+    base_prompt_improving,
+    base_prompt_minimal,
+    base_prompt_template,
+    batch_prompt_header,
+    optimization_request_header,
+    web_scraping_prompt,
+)
+from utils import load_config_yaml, load_json_obj
 
 # Configurazione logging
 logging.basicConfig(
@@ -20,34 +38,211 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+COMPANY_HINTS_PATH = "src/Data_Extraction/config/model_config/company_hints.json"
+
+# An optimized prompt is accepted only if it is long enough and can still be filled with the company name
+MIN_OPTIMIZED_PROMPT_LENGTH = 100
+COMPANY_NAME_PLACEHOLDER = "{company_name}"
+
+
+# Markdown code fences around a JSON answer
+_JSON_FENCE_RE = re.compile(r"^```(?:json)?|```$", re.IGNORECASE | re.MULTILINE)
+
+# Key the Gemini client was configured with, None until the first configuration
+_configured_api_key: str | None = None
+
+
+def configure_client(api_key: str | None = None) -> None:
+    """
+    Configure the Gemini client once per process.
+
+    Every model built afterwards shares this client and its connections. Calling it again without a key,
+    or with the key already in use, does nothing.
+
+    Args:
+        api_key (str): API key for Gemini, read from GOOGLE_API_KEY if not provided.
+    """
+    global _configured_api_key
+    if _configured_api_key is not None and api_key in (None, _configured_api_key):
+        return
+    api_key = api_key or os.getenv("GOOGLE_API_KEY")
+    if not api_key:
+        return  # Let the library fall back to its default credentials
+    genai.configure(api_key=api_key)
+    _configured_api_key = api_key
+
+
+# Canonical spelling used on both sides of the match: "p.l.c." and "plc", "&" and "and" are the same key
+_NAME_TRANSLATION = str.maketrans({".": None, ",": None, "&": " and ", "-": " "})
+
+
+def _normalize_company_name(company_name: str) -> str:
+    """Lowercase the name, strip the punctuation and collapse the whitespace."""
+    return " ".join(company_name.lower().translate(_NAME_TRANSLATION).split())
+
+
+@functools.lru_cache(maxsize=1)
+def _load_company_hints() -> tuple[dict[str, str], dict[str, list[str]]]:
+    """
+    Load the company hints on first use and index their keys by token.
+
+    The hints map a significant, lowercase part of the company name to a suggestion for the search.
+
+    Returns
+    -------
+        tuple: Hints keyed by normalized name, and the inverted index token -> keys containing it.
+    """
+    known_info = load_json_obj(COMPANY_HINTS_PATH)
+    normalized_info = {_normalize_company_name(key): value for key, value in known_info.items()}
+    token_index: dict[str, list[str]] = defaultdict(list)
+    for key in normalized_info:
+        for token in dict.fromkeys(key.split()):
+            token_index[token].append(key)
+    return normalized_info, dict(token_index)
+
+
+@functools.cache
+def _lookup_company_info(normalized_company_name: str) -> str | None:
+    """
+    Return the hint of the most specific known key found in the normalized company name.
+
+    Only the keys sharing a whole token with the name are candidates, and a candidate must start
+    at a word boundary of the name: "kone" no longer matches KONECRANES, while "oracle corp" still
+    matches ORACLE CORPORATION. The longest matching key wins.
+    """
+    normalized_info, token_index = _load_company_hints()
+    if normalized_company_name in normalized_info:
+        return normalized_info[normalized_company_name]
+
+    candidates = dict.fromkeys(key for token in normalized_company_name.split() for key in token_index.get(token, ()))
+    padded_name = f" {normalized_company_name}"
+    matches = [key for key in candidates if f" {key}" in padded_name]
+    if not matches:
+        return None
+    key = max(matches, key=len)
+    logger.debug("Found specific hint for '%s' based on the key '%s'", normalized_company_name, key)
+    return normalized_info[key]
+
+
+@functools.lru_cache(maxsize=64)
+def compile_template(template: str) -> Callable[..., str]:
+    """
+    Split a `str.format` template once in literal parts and fields.
+
+    The returned function renders the template by plain concatenation, without parsing it again.
+    Only plain fields are supported, as in the prompt templates (no format spec or conversion).
+    """
+    parts = [(literal, field) for literal, field, _, _ in string.Formatter().parse(template)]
+
+    def render(**fields: object) -> str:
+        return "".join(literal if field is None else literal + str(fields[field]) for literal, field in parts)
+
+    return render
+
+
+@functools.lru_cache(maxsize=1024)
+def _web_scraping_prompt(template: str, company_name: str, variable: str) -> str:
+    """Render the web scraping prompt, once per (company, variable) pair."""
+    return compile_template(template)(company_name=company_name, variable=variable)
+
+
+@functools.lru_cache(maxsize=4096)
+def _scraping_based_prompt(base_template: str, company_name: str, scraping_results: tuple) -> str:
+    """
+    Render the fallback prompt from the scraping results.
+
+    The base template only takes the company name and the variable, the suggestions are appended to it.
+    Pure function of its arguments, so each (company, scraping results) pair is rendered once.
+    """
+    if not scraping_results or not any(scraping_results):
+        # No usable scraping results, use an improved generic prompt
+        return (
+            compile_template(base_template)(company_name=company_name, variable="Annual Report")
+            + "\nBe careful to search thoroughly, previous attempts have not produced valid results.\n"
+        )
+
+    url, year, desc, conf = scraping_results
+
+    # Create a prompt that incorporates scraping results as suggestions
+    parts = [
+        compile_template(base_template)(company_name=company_name, variable=desc or "Annual Report"),
+        "\nSUGGESTIONS BASED ON PREVIOUS SEARCHES:",
+        f"\n- The source type '{desc}' seems appropriate for this company",
+    ]
+    if url:
+        try:
+            parts.append(f"\n- Consider the domain {urlparse(url).netloc} which seems promising for this search")
+        except ValueError:
+            logger.warning("Unable to parse the URL domain: %s", url)
+    if year:
+        parts.append(f"\n- The fiscal year {year} appears to be available, but check if more recent reports exist")
+    parts.append(f"\n- The previous search had a confidence level of '{conf}', try to improve it\n")
+
+    return "".join(parts)
+
 
 class PromptGenerator:
     """Mananage the prompt generation and optimization for the financial data source finder."""
 
+    # Models shared by all the instances, built once per model name
+    _model_pool: dict[str, genai.GenerativeModel] = {}  # noqa: RUF012
+
     def __init__(self):
         """Inizialize the prompt generator."""
         self.config = load_config_yaml("src/Data_Extraction/config/model_config/config.yaml")
-        # Base prompt template for generating the initial prompt
-        self.base_prompt_template = base_prompt_template
+        # Base prompt template for generating the initial prompt, the minimal variant costs far fewer input tokens
+        self.base_prompt_template = base_prompt_minimal if self.config["prompt_variant"] == "minimal" else base_prompt_template
         self.improve_prompt_template = base_prompt_improving
+        self.optimization_request_header = optimization_request_header
         # Dictionary to store company-specific prompts
         self.company_specific_prompts = {}
         self.web_scraping_prompt_template = web_scraping_prompt
+        self.batch_prompt_header = batch_prompt_header
+        # Limits of a single batched request
+        self.max_batch_size = self.config["max_batch_size"]
+        self.max_batch_chars = self.config["max_batch_chars"]
 
         # Counter for tracking the number of optimizations per company
         self.max_retries = self.config["max_retries"]
         self.optimization_counter = {}
+        # The batch optimizations count the attempts from several threads
+        self._counter_lock = threading.Lock()
+        self.max_optimizations = self.config["max_optimizations"]
+        # Signature of the inputs of the last accepted optimization, per company
+        self._last_signature: dict[str, bytes] = {}
         self.models_name = self.config["models_name"]
-
-    def inizialize_model(self):
+        # Created on first use by `initialize_model`
+        self.model: genai.GenerativeModel | None = None
+        self.selected_model_name: str | None = None
+        self._model_lock = threading.Lock()
+
+        # Rendered prompts, reused across retries
+        self._prompt_cache: dict[tuple[str, str], str] = {}
+        # Optimized prompts returned by the model, persisted across runs
+        self.response_cache = ResponseCache(self.config["response_cache_dir"])
+        self.use_response_cache = self.config["use_response_cache"]
+
+    def initialize_model(self) -> genai.GenerativeModel:
         """
-        Initialize the model with the selected model name.
+        Return the model of this generator, creating it on first use.
 
-        This method is called to set up the model for generating content.
+        The model is drawn once among `models_name` and taken from the pool shared by the generators,
+        so each model is built once per process and not on every call.
         """
-        self.selected_model_name = secrets.choice(self.models_name)
-        logger.info("Selected model: %s", self.selected_model_name)
-        self.model = genai.GenerativeModel(self.selected_model_name)
+        if self.model is None:
+            with self._model_lock:
+                if self.model is None:
+                    configure_client()
+                    # Load balancing between the models, not a security decision: no need for the OS CSPRNG
+                    selected_model_name = random.choice(self.models_name)  # noqa: S311
+                    logger.info("Selected model: %s", selected_model_name)
+                    model = self._model_pool.get(selected_model_name)
+                    if model is None:
+                        model = genai.GenerativeModel(selected_model_name)
+                        self._model_pool[selected_model_name] = model
+                    self.selected_model_name = selected_model_name
+                    self.model = model
+        return self.model
 
     def generate_prompt(self, company_name: str, variable: str) -> str:
         """
@@ -61,6 +256,11 @@ class PromptGenerator:
         -------
             str: Prompt optimize.
         """
+        cache_key = (company_name, variable)
+        cached_prompt = self._prompt_cache.get(cache_key)
+        if cached_prompt is not None:
+            return cached_prompt
+
         optimization_text = ""
 
         # Enrich the prompt with additional information if available
@@ -69,7 +269,9 @@ class PromptGenerator:
             optimization_text += f"\n\nAdditioanl Information: {company_info}"
 
         # Generate the final prompt
-        return self.base_prompt_template.format(company_name=company_name, variable=variable)
+        prompt = compile_template(self.base_prompt_template)(company_name=company_name, variable=variable)
+        self._prompt_cache[cache_key] = prompt
+        return prompt
 
     def improve_prompt(self, company_name: str, feedback: dict, current_prompt: str, scraping_results: tuple) -> str:
         """
@@ -85,342 +287,242 @@ class PromptGenerator:
         -------
             str: Prompt ottimizzato
         """
-        
-
-        
-        # Generate the optimization request
-        optimization_request = self._create_optimization_request(company_name, feedback, scraping_results)
+        signature = self._optimization_signature(feedback, current_prompt, scraping_results)
+        reusable_prompt = self._reusable_prompt(company_name, feedback, current_prompt, signature)
+        if reusable_prompt is not None:
+            return reusable_prompt
+        if not self._next_optimization_attempt(company_name):
+            return self._generate_scraping_based_prompt(company_name, scraping_results)
 
         try:
-            response = self.model.generate_content(
-                optimization_request,
-                generation_config={
-                    "temperature": self.config["temperature"],
-                    "top_p": self.config["top_p"],
-                    "max_output_tokens": self.config["max_output_tokens"],
-                },
-            )
-
-            # Extract the optimized prompt from the response
-            optimized_prompt = response.text.strip()
-
-            # Verify the optimized prompt
-            if len(optimized_prompt) < 100 or "{company_name}" not in optimized_prompt:
-                logger.warning("Invalid optimized prompt for %s: %s", company_name, optimized_prompt)
-                return self._generate_scraping_based_prompt(company_name, scraping_results)
-
-            # Store the optimized prompt for the company
-            self.company_specific_prompts[company_name] = optimized_prompt
-
-            logger.info(
-                "Optimized prompt for %s (Attempt %s): %s",
-                company_name,
-                self.optimization_counter[company_name],
-                optimized_prompt,
-            )
-
-            return optimized_prompt  # noqa: TRY300
+            optimization_request, cache_key = self._build_optimization_request(company_name, feedback, current_prompt, scraping_results)
+            optimized_prompt = self.response_cache.get(cache_key) if cache_key else None
+            if optimized_prompt is None:
+                response = generate_with_retry(self.model, optimization_request, self.config, generation_config=self._generation_config(), stream=True)
+
+                # Extract the optimized prompt from the response, consuming the chunks as they are generated
+                optimized_prompt = "".join(chunk.text for chunk in response).strip()
+            else:
+                logger.info("Using cached optimized prompt for %s", company_name)
+
+            return self._accept_optimized_prompt(company_name, optimized_prompt, cache_key, scraping_results, signature)
 
         except Exception:
             logger.exception("Error during prompt optimization for %s", company_name)
             # In case of failure, use the scraping results as a fallback
             return self._generate_scraping_based_prompt(company_name, scraping_results)
 
-    def _create_optimization_request(self, company_name, feedback, current_prompt, scraping_results):
-        """Create the request for optimization of the prompt."""
-        pass
-        
-    def _generate_scraping_based_prompt(self, company_name: str, scraping_results: str) -> str:
-        """Generate a prompt based on scraping results when optimization fails."""
-        if not scraping_results or not any(scraping_results):
-            # No usable scraping results, use an improved generic prompt
-            return self.base_prompt_template.format(
-                company_name=company_name,
-                source_type="Annual Report",
-                optimization_instructions="Be careful to search thoroughly, previous attempts have not produced valid results.",
-            )
-
-        url, year, desc, conf = scraping_results
-
-        # Create a prompt that incorporates scraping results as suggestions
-        domain_hint = ""
-        if url:
-            try:
-                domain = urlparse(url).netloc
-                domain_hint = f"\n- Consider the domain {domain} which seems promising for this search"
-            except Exception as e:
-                logger.exception("Error parsing URL domain: %s", e)  # noqa: TRY401
-
-        year_hint = ""
-        if year:
-            year_hint = f"\n- The fiscal year {year} appears to be available, but check if more recent reports exist"
-
-        optimization_text = f"""
-        SUGGESTIONS BASED ON PREVIOUS SEARCHES:
-        - The source type '{desc}' seems appropriate for this company{domain_hint}{year_hint}
-        - The previous search had a confidence level of '{conf}', try to improve it
+    def improve_prompts_batch(self, items: list[tuple[str, dict, str, tuple]]) -> list[str]:
+        """
+        Optimize the prompts of several companies concurrently.
+
+        Each item goes through `improve_prompt` in a pool of at most `max_concurrency` threads, so the
+        requests keep the retries, the concurrency slots and the rate limit of `generate_with_retry`
+        while their round-trips overlap.
+
+        Args:
+            items (list): Tuples of (company_name, feedback, current_prompt, scraping_results),
+                the same arguments accepted by `improve_prompt`.
+
+        Returns
+        -------
+            list: Optimized prompts, in the same order as the items.
+        """
+        if len(items) <= 1:
+            return [self.improve_prompt(*item) for item in items]
+        with ThreadPoolExecutor(max_workers=min(self.config["max_concurrency"], len(items))) as executor:
+            return list(executor.map(lambda item: self.improve_prompt(*item), items))
+
+    @staticmethod
+    def _optimization_signature(feedback: dict, current_prompt: str, scraping_results: tuple) -> bytes:
+        """Hash the inputs of an optimization, to detect a request identical to the previous one."""
+        payload = json.dumps([feedback, current_prompt, scraping_results], sort_keys=True, default=str)
+        return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).digest()
+
+    def _reusable_prompt(self, company_name: str, feedback: dict, current_prompt: str, signature: bytes) -> str | None:
+        """Return the prompt to use without calling the model, or None if an optimization is needed."""
+        if not feedback:
+            logger.info("No feedback for %s, keeping the current prompt", company_name)
+            return current_prompt
+        if self._last_signature.get(company_name) == signature:
+            logger.info("Same feedback as the last optimization for %s, reusing its prompt", company_name)
+            return self.company_specific_prompts[company_name]
+        return None
+
+    def _next_optimization_attempt(self, company_name: str) -> bool:
+        """Count a new optimization attempt for the company, return False once the limit is reached."""
+        with self._counter_lock:
+            attempts = self.optimization_counter.get(company_name, 0)
+            if attempts < self.max_optimizations:
+                self.optimization_counter[company_name] = attempts + 1
+                return True
+        logger.warning("Maximum number of optimizations (%d) reached for %s", self.max_optimizations, company_name)
+        return False
+
+    def _generation_config(self) -> dict:
+        """Return the generation parameters used for the prompt optimization."""
+        return {
+            "temperature": self.config["temperature"],
+            "top_p": self.config["top_p"],
+            "max_output_tokens": self.config["max_output_tokens"],
+        }
+
+    def _build_optimization_request(self, company_name: str, feedback: dict, current_prompt: str, scraping_results: tuple) -> tuple[str, str | None]:
+        """Build the optimization request and its response cache key (None with `use_response_cache` disabled), without sending it."""
+        self.initialize_model()
+        optimization_request = self._create_optimization_request(company_name, feedback, current_prompt, scraping_results)
+        cache_key = None
+        if self.use_response_cache:
+            cache_key = ResponseCache.make_key(model=self.selected_model_name, request=optimization_request, **self._generation_config())
+        return optimization_request, cache_key
+
+    def _accept_optimized_prompt(self, company_name: str, optimized_prompt: str, cache_key: str | None, scraping_results: tuple, signature: bytes) -> str:
+        """Validate the optimized prompt and store it, falling back to the scraping based prompt if invalid."""
+        # Verify the optimized prompt
+        if len(optimized_prompt) < MIN_OPTIMIZED_PROMPT_LENGTH or COMPANY_NAME_PLACEHOLDER not in optimized_prompt:
+            logger.warning("Invalid optimized prompt for %s: %s", company_name, optimized_prompt)
+            return self._generate_scraping_based_prompt(company_name, scraping_results)
+
+        # Store the optimized prompt for the company
+        self.company_specific_prompts[company_name] = optimized_prompt
+        if cache_key:
+            self.response_cache.set(cache_key, optimized_prompt)
+        self._last_signature[company_name] = signature
+
+        attempt = self.optimization_counter.get(company_name, 0)
+        logger.info("Optimized prompt for %s (Attempt %s, %d chars)", company_name, attempt, len(optimized_prompt))
+        # The full prompt is several KB, only write it to the log handlers when debugging
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Optimized prompt for %s (Attempt %s): %s", company_name, attempt, optimized_prompt)
+
+        return optimized_prompt
+
+    def _create_optimization_request(self, company_name: str, feedback: dict, current_prompt: str, scraping_results: tuple) -> str:
         """
+        Create the request for optimization of the prompt.
 
-        return self.base_prompt_template.format(company_name=company_name, source_type=desc or "Annual Report", optimization_instructions=optimization_text)
+        The static instructions come first and the company specific content is appended at the end,
+        so every request starts with the same prefix and can hit the provider prompt cache.
+        """
+        return (
+            f"{self.optimization_request_header}\n"
+            "---\n"
+            f"Company: {company_name}\n"
+            f"Feedback: {feedback}\n"
+            f"Scraping results: {scraping_results}\n"
+            f"Current prompt:\n```{current_prompt}```"
+        )
+
+    def _generate_scraping_based_prompt(self, company_name: str, scraping_results: tuple) -> str:
+        """Generate a prompt based on scraping results when optimization fails."""
+        return _scraping_based_prompt(self.base_prompt_template, company_name, tuple(scraping_results or ()))
 
-    def _get_company_additional_info(self, company_name: str) -> str:
+    def _get_company_additional_info(self, company_name: str) -> str | None:
         """
         Provide predefined specific information (hints) for certain companies.
 
         These are heuristic suggestions based on common suffixes and well-known names.
         Accuracy is not guaranteed, and the list is not exhaustive.
+        Results are cached per normalized company name.
         """
-        # Dizionario di hints (chiave è una parte significativa del nome, case-insensitive)
-        # NOTA: Mantenere le chiavi in lowercase per il matching
-        known_info = {
-            # Esempi USA/Canada (INC, CORP, CO, PLC-Ireland/Canada)
-            "johnson controls": "Azienda globale (registrata in Irlanda, sede USA?). Cerca 'Investors' sul sito .com. Considera SEC filings (10-K/Q).",
-            "magna international": "Azienda Canadese. Cerca 'Investors' sul sito .com.",
-            "abbott laboratories": "Azienda USA. Focus su SEC filings (10-K, 10-Q) e sito IR (abbottinvestor.com).",
-            "oracle corp": "Azienda USA. Focus su SEC filings (10-K, 10-Q) e sito IR (investor.oracle.com). FY finisce Maggio.",
-            "procter & gamble": "Azienda USA. Focus su SEC filings (10-K, 10-Q) e sito IR (pginvestor.com). FY finisce Giugno.",
-            "warner bros. discovery": "Azienda USA. Focus su SEC filings (10-K, 10-Q) e sito IR (ir.wbd.com).",
-            "general electric": "Azienda USA. Focus su SEC filings (10-K, 10-Q) e sito IR (ge.com/investor-relations).",
-            "aptiv plc": "Azienda globale (registrata in Irlanda, origini USA?). Cerca 'Investors' sul sito .com. Considera SEC filings (10-K/Q).",
-            "amazon": "Azienda USA. Focus su SEC filings (10-K, 10-Q) sul sito IR: ir.aboutamazon.com. FY standard (Dicembre).",
-            "pfizer inc": "Azienda USA. Focus su SEC filings (10-K, 10-Q) e sito IR (investors.pfizer.com).",
-            "coca-cola company": "Azienda USA. Focus su SEC filings (10-K, 10-Q) e sito IR (investors.coca-colacompany.com).",
-            "caterpillar inc": "Azienda USA. Focus su SEC filings (10-K, 10-Q) e sito IR (investors.caterpillar.com).",
-            "manpowergroup inc.": "Azienda USA. Focus su SEC filings (10-K, 10-Q) e sito IR (investor.manpowergroup.com).",
-            "paramount global": "Azienda USA. Focus su SEC filings (10-K, 10-Q) e sito IR (ir.paramount.com).",
-            "hp inc.": "Azienda USA. Focus su SEC filings (10-K, 10-Q) e sito IR (investor.hp.com). FY finisce Ottobre.",
-            "goodyear tire & rubber": "Azienda USA. Focus su SEC filings (10-K, 10-Q) e sito IR (investor.goodyear.com).",
-            "brookfield corporation": "Azienda Canadese. Cerca 'Investors' o 'Shareholders' sul sito .com.",
-            "microsoft corporation": "Azienda USA. Focus su SEC filings (10-K, 10-Q) e sito IR: microsoft.com/en-us/investor. FY finisce Giugno.",
-            "mondelez international": "Azienda USA. Focus su SEC filings (10-K, 10-Q) e sito IR (ir.mondelezinternational.com).",
-            "international business machines": "IBM. Azienda USA. Focus su SEC filings (10-K, 10-Q) e sito IR (ibm.com/investor).",
-            "meta platforms": "Facebook/Meta. Azienda USA. Focus su SEC filings (10-K, 10-Q) e sito IR (investor.fb.com).",
-            "walt disney company": "Azienda USA. Focus su SEC filings (10-K, 10-Q) e sito IR (thewaltdisneycompany.com/investor-relations/). FY finisce Settembre.",
-            "pepsico inc": "Azienda USA. Focus su SEC filings (10-K, 10-Q) e sito IR (pepsico.com/investors).",
-            "thermo fisher scientific": "Azienda USA. Focus su SEC filings (10-K, 10-Q) e sito IR (ir.thermofisher.com).",
-            "accenture plc": "Azienda globale (registrata in Irlanda). Cerca 'Investor Relations' sito .com. Considera SEC filings (10-K/Q). FY finisce Agosto.",
-            "exxon mobil corp": "Azienda USA. Focus su SEC filings (10-K, 10-Q) e sito IR (corporate.exxonmobil.com/investors).",
-            "dell technologies": "Azienda USA. Focus su SEC filings (10-K, 10-Q) e sito IR (investors.delltechnologies.com). FY finisce Gennaio/Febbraio.",
-            "alphabet inc.": "Google. Azienda USA. Focus su SEC filings (10-K, 10-Q) per Alphabet Inc. sul sito IR: abc.xyz/investor/. FY standard (Dicembre).",
-            "johnson & johnson": "Azienda USA. Focus su SEC filings (10-K, 10-Q) e sito IR (investor.jnj.com).",
-            "stanley black & decker": "Azienda USA. Focus su SEC filings (10-K, 10-Q) e sito IR (investor.stanleyblackanddecker.com).",
-            "eaton corporation": "Azienda globale (registrata in Irlanda). Cerca 'Investor Relations' sito .com. Considera SEC filings (10-K/Q).",
-            # Esempi Europa Continentale (AG, SE, SA, NV, SPA, etc.)
-            "adecco group ag": "Azienda Svizzera (AG). Cerca 'Investors' sul sito .com.",
-            "publicis groupe": "Azienda Francese (SA). Cerca 'Investisseurs' o 'Investors' sul sito .com. Controlla per ESEF format.",
-            "gebr. knauf": "Azienda Tedesca (privata?). Potrebbe essere difficile trovare dati pubblici. Cerca 'Presse', 'Unternehmen'.",
-            "compagnie de saint gobain": "Azienda Francese (SA). Cerca 'Finance' o 'Investors' sul sito .com. Controlla per ESEF format.",
-            "engie": "Azienda Francese (SA). Cerca 'Finance' o 'Investors' sul sito .com. Controlla per ESEF format.",
-            "thyssenkrupp": "Azienda Tedesca (AG). Cerca 'Investoren' o 'Investors' sul sito .com.",
-            "voestalpine": "Azienda Austriaca (AG). Cerca 'Investoren' o 'Investors' sul sito .com.",
-            "orange": "Azienda Francese (SA). Cerca 'Finance' o 'Investors' sul sito .com. Controlla per ESEF format.",
-            "accor": "Azienda Francese (SA). Cerca 'Finance' o 'Investors' sul sito .com. Controlla per ESEF format.",
-            "fcc": "Fomento de Construcciones y Contratas. Azienda Spagnola (SA). Cerca 'Inversores' o 'Investors'.",
-            "societe nationale sncf": "Azienda Francese (Statale?). Cerca 'Finance' o 'Groupe'. Potrebbe avere report specifici.",
-            "crh plc": "Azienda Irlandese (PLC). Cerca 'Investors' sul sito .com. Controlla per ESEF format.",  # Anche se PLC, base Irlanda -> EU
-            "deutsche bahn": "Azienda Tedesca (AG, Statale?). Cerca 'Investor Relations' o 'Finanzberichte'.",
-            "safran": "Azienda Francese (SA). Cerca 'Finance' o 'Investors' sul sito .com. Controlla per ESEF format.",
-            "basf": "Azienda Tedesca (SE). Cerca 'Investor Relations' sul sito basf.com. Controlla per ESEF format.",
-            "wpp plc": "Azienda UK (PLC). Cerca 'Investors' sul sito .com.",  # Spostato qui perchè PLC è tipico UK
-            "gi group": "Azienda Italiana (Holding, SPA?). Cerca 'Investor Relations' o 'Gruppo'.",
-            "acciona": "Azienda Spagnola (SA). Cerca 'Accionistas e Inversores' o 'Investors'.",
-            "sodexo": "Azienda Francese (SA). Cerca 'Finance' o 'Investors'.",
-            "akzo nobel nv": "Azienda Olandese (NV). Cerca 'Investors' sul sito .com.",
-            "dior": "Parte di LVMH. Azienda Francese. Cerca report LVMH, sezione 'Finance' o 'Investors'.",
-            "sonova": "Azienda Svizzera (Holding AG). Cerca 'Investor Relations'.",
-            "ikea": "Ingka Holding B.V. Azienda Olandese/Svedese (privata?). Dati finanziari potrebbero essere limitati. Cerca 'About us', 'Reports'.",
-            "airbus se": "Azienda Europea (SE, Olanda/Francia/Germania). Cerca 'Investors' o 'Finance' sul sito airbus.com.",
-            "etex": "Azienda Belga. Cerca 'Investors' o 'Financial'.",
-            "siemens": "Azienda Tedesca (AG). Cerca 'Investor Relations' sul sito .com. Controlla per ESEF. FY finisce Settembre.",
-            "mol hungarian oil": "Azienda Ungherese. Cerca 'Investor Relations'.",
-            "krones": "Azienda Tedesca (AG). Cerca 'Investoren'.",
-            "sanofi": "Azienda Francese (SA). Cerca 'Investisseurs' o 'Investors'.",
-            "wurth": "Würth Group. Azienda Tedesca (privata?). Dati potrebbero essere limitati. Cerca 'Unternehmen', 'Presse', 'Reports'.",
-            "totalenergies se": "Azienda Francese (SE). Cerca 'Finance' o 'Investors'.",
-            "koninklijke ahold delhaize nv": "Azienda Olandese/Belga (NV). Cerca 'Investors'.",
-            "hartmann": "Paul Hartmann AG. Azienda Tedesca. Cerca 'Investoren'.",
-            "sap": "Azienda Tedesca (SE). Cerca 'Investor Relations' sul sito sap.com.",
-            "enel spa": "Azienda Italiana (SPA). Cerca 'Investitori' o 'Investors'.",
-            "shv holdings nv": "Azienda Olandese (privata?). Dati potrebbero essere limitati.",
-            "bmw": "Bayerische Motoren Werke AG. Azienda Tedesca. Cerca 'Investor Relations'.",
-            "thales": "Azienda Francese (SA). Cerca 'Finance' o 'Investors'.",
-            "signify nv": "Ex Philips Lighting. Azienda Olandese (NV). Cerca 'Investor Relations'.",
-            "bayer": "Azienda Tedesca (AG). Cerca 'Investoren' o 'Investors'.",
-            "veolia environnement": "Azienda Francese (SA). Cerca 'Finance' o 'Investors'.",
-            "tui": "Azienda Tedesca/UK (AG/PLC?). Cerca 'Investors'.",
-            "randstad nv": "Azienda Olandese (NV). Cerca 'Investors'.",
-            "nv bekaert sa": "Azienda Belga (NV/SA). Cerca 'Investors'.",
-            "glencore plc": "Azienda Svizzera/UK (PLC). Cerca 'Investors'.",
-            "deutsche lufthansa": "Azienda Tedesca (AG). Cerca 'Investor Relations'.",
-            "abb ltd": "Azienda Svizzera/Svedese (Ltd ma base Svizzera). Cerca 'Investor Relations'.",
-            "capgemini": "Azienda Francese (SE). Cerca 'Finance' o 'Investors'.",
-            "merck group": "Merck KGaA. Azienda Tedesca. Cerca 'Investoren' o 'Investors'.",
-            "bpost": "Azienda Belga (SA/NV). Cerca 'Investors'.",
-            "synlab": "Azienda Tedesca (AG). Cerca 'Investor Relations'.",
-            "l air liquide": "Air Liquide SA. Azienda Francese. Cerca 'Investors'.",
-            "umicore": "Azienda Belga (SA/NV). Cerca 'Investors'.",
-            "kone": "Azienda Finlandese (Oyj). Cerca 'Investors'.",
-            "nokia": "Azienda Finlandese (Oyj). Cerca 'Investors'.",
-            "telefonica": "Azienda Spagnola (SA). Cerca 'Accionistas e Inversores'.",
-            "eni s p a": "Azienda Italiana (SPA). Cerca 'Investitori' o 'Investors'.",
-            "arcelormittal": "Azienda Lussemburghese (SA). Cerca 'Investors'.",
-            "heidelbergcement": "Heidelberg Materials AG. Azienda Tedesca. Cerca 'Investor Relations'.",
-            "medtronic plc": "Azienda globale (registrata Irlanda). Cerca 'Investor Relations'. Considera SEC filings. FY finisce Aprile.",
-            "nestle s.a.": "Azienda Svizzera (SA). Cerca 'Investors'.",
-            "novomatic group": "Azienda Austriaca (AG). Cerca 'Investor Relations'.",
-            "rethmann": "Rethmann SE & Co. KG. Azienda Tedesca (privata?). Dati limitati.",
-            "jbs s.a.": "Azienda Brasiliana (SA). Cerca 'Investidores' o 'Investors'.",
-            "mercedes-benz group": "Azienda Tedesca (AG). Cerca 'Investor Relations'.",
-            "compass group plc": "Azienda UK (PLC). Cerca 'Investors'. FY finisce Settembre.",
-            "atos se": "Azienda Francese (SE). Cerca 'Finance' o 'Investors'.",
-            "volkswagen": "Azienda Tedesca (AG). Cerca 'Investor Relations'.",
-            "deutsche telekom": "Azienda Tedesca (AG). Cerca 'Investor Relations'.",
-            "alstom": "Azienda Francese (SA). Cerca 'Finance' o 'Investors'.",
-            "danone": "Azienda Francese (SA). Cerca 'Finance' o 'Investors'.",
-            "deutsche post": "DHL Group. Azienda Tedesca (AG). Cerca 'Investor Relations'.",
-            "schaeffler": "Azienda Tedesca (AG). Cerca 'Investor Relations'.",
-            "bouygues": "Azienda Francese (SA). Cerca 'Finance' o 'Investors'.",
-            "edp": "Energias de Portugal SA. Azienda Portoghese. Cerca 'Investidores'.",
-            "novartis ag": "Azienda Svizzera (AG). Cerca 'Investors'.",
-            "henkel kgaa": "Azienda Tedesca (KGaA). Cerca 'Investor Relations'.",
-            "d ieteren group": "Azienda Belga (SA/NV). Cerca 'Investors'.",
-            "heineken": "Azienda Olandese (NV). Cerca 'Investors'.",
-            "inditex": "Azienda Spagnola (SA). Zara etc. Cerca 'Inversores'. FY finisce Gennaio.",
-            "iberdrola": "Azienda Spagnola (SA). Cerca 'Accionistas e Inversores'.",
-            "leonardo societa per azioni": "Azienda Italiana (SPA). Cerca 'Investitori'.",
-            "bosch": "Robert Bosch GmbH. Azienda Tedesca (privata?). Dati limitati. Cerca 'Unternehmen', 'Reports'.",
-            "essilorluxottica": "Azienda Francese/Italiana (SA). Cerca 'Investors'.",
-            "sgs": "Azienda Svizzera (SA). Cerca 'Investor Relations'.",
-            "compagnie generale des etablissements michelin": "Michelin. Azienda Francese (SCA). Cerca 'Finance' o 'Investors'.",
-            "holcim ag": "Azienda Svizzera (AG). Cerca 'Investors'.",
-            "schneider electric se": "Azienda Francese (SE). Cerca 'Finance' o 'Investors'.",
-            "eurofins scientific": "Azienda Lussemburghese/Francese (SE). Cerca 'Investors'.",
-            "repsol": "Azienda Spagnola (SA). Cerca 'Accionistas e Inversores'.",
-            "anheuser-busch inbev": "AB InBev. Azienda Belga/Globale (SA/NV). Cerca 'Investors'.",
-            "novo nordisk": "Azienda Danese (A/S). Cerca 'Investors'.",
-            "solvay": "Azienda Belga (SA). Cerca 'Investors'.",
-            "bertelsmann stiftung": "Fondazione Tedesca. Non è una società quotata standard. Dati potrebbero essere diversi.",
-            "wienerberger group": "Azienda Austriaca (AG). Cerca 'Investors'.",
-            "krka tovarna zdravil dd novo mesto": "KRKA d.d. Azienda Slovena. Cerca 'Investors'.",
-            "prysmian s.p.a.": "Azienda Italiana (SPA). Cerca 'Investitori'.",
-            "vinci": "Azienda Francese (SA). Cerca 'Finance' o 'Investors'.",
-            "kuehne nagel": "Kuehne + Nagel International AG. Azienda Svizzera. Cerca 'Investor Relations'.",
-            "strabag group": "Azienda Austriaca (SE). Cerca 'Investor Relations'.",
-            "prosegur": "Prosegur Compañía de Seguridad SA. Azienda Spagnola. Cerca 'Inversores'.",
-            "andritz group": "Azienda Austriaca (AG). Cerca 'Investors'.",
-            "asseco": "Asseco Poland SA (o gruppo?). Azienda Polacca. Cerca 'Investor Relations' o 'Relacje inwestorskie'.",
-            "electricite de france": "EDF. Azienda Francese (SA, Statale?). Cerca 'Finance' o 'Investors'.",
-            "l oreal": "L'Oréal SA. Azienda Francese. Cerca 'Finance' o 'Investors'.",
-            "stellantis": "Azienda Olandese/Globale (NV). Fiat Chrysler Peugeot etc. Cerca 'Investors'.",
-            # Esempi Asia/Pacifico (LTD, CORPORATION, K.K.)
-            "bridgestone corporation": "Azienda Giapponese. Cerca 'Investor Relations' sul sito globale .com. FY finisce Dicembre.",
-            "sumitomo corporation": "Azienda Giapponese. Cerca 'Investor Relations' sul sito globale .com. FY finisce Marzo.",
-            "dentsu group inc.": "Azienda Giapponese. Cerca 'Investor Relations'. FY finisce Dicembre.",
-            "fujitsu limited": "Azienda Giapponese. Cerca 'Investor Relations'. FY finisce Marzo.",
-            "sony group corporation": "Azienda Giapponese. Cerca 'Investor Relations' sul sito sony.com/en/SonyInfo/IR/. FY finisce Marzo.",
-            "hbis group co. ltd.": "Hebei Iron and Steel. Azienda Cinese (Statale?). Dati potrebbero essere sul sito cinese o limitati.",
-            "nippon steel corporation": "Azienda Giapponese. Cerca 'Investor Relations'. FY finisce Marzo.",
-            "mitsui & co ltd": "Azienda Giapponese. Cerca 'Investor Relations'. FY finisce Marzo.",
-            "h & m hennes & mauritz": "H&M. Azienda Svedese (AB). Cerca 'Investors'. FY finisce Novembre.",
-            "toyota motor corporation": "Azienda Giapponese. Cerca 'Investor Relations' sul sito global.toyota/en/ir/. FY finisce Marzo.",
-            "itochu corporation": "Azienda Giapponese. Cerca 'Investor Relations'. FY finisce Marzo.",
-            "nippon telegraph and telephone": "NTT. Azienda Giapponese. Cerca 'Investor Relations'. FY finisce Marzo.",
-            "zhejiang geely holding group": "Geely. Azienda Cinese. Dati potrebbero essere limitati.",
-            "sinochem": "Azienda Cinese (Statale?). Dati limitati.",
-            "john swire & sons limited": "Swire Group. Holding basata a Hong Kong/UK. Dati potrebbero essere complessi o per sussidiarie.",
-            "marubeni corporation": "Azienda Giapponese. Cerca 'Investor Relations'. FY finisce Marzo.",
-            "hitachi ltd": "Azienda Giapponese. Cerca 'Investor Relations'. FY finisce Marzo.",
-            "samsung electronics co. ltd.": "Azienda Sudcoreana. Cerca 'Investor Relations' sul sito globale samsung.com.",
-            "mitsubishi corporation": "Azienda Giapponese. Cerca 'Investor Relations'. FY finisce Marzo.",
-            "canon incorporated": "Azienda Giapponese. Cerca 'Investor Relations'. FY finisce Dicembre.",
-            # Esempi Nordici (AB, ASA, A/S, OYJ)
-            "atlas copco aktiebolag": "Azienda Svedese (AB). Cerca 'Investors'.",
-            "aktiebolaget skf": "SKF. Azienda Svedese (AB). Cerca 'Investors'.",
-            "securitas ab": "Azienda Svedese (AB). Cerca 'Investors'.",
-            "dsv a/s": "Azienda Danese (A/S). Cerca 'Investor'.",
-            "konecranes": "Azienda Finlandese (Oyj). Cerca 'Investors'.",
-            "sandvik aktiebolag": "Azienda Svedese (AB). Cerca 'Investors'.",
-            "skanska ab": "Azienda Svedese (AB). Cerca 'Investors'.",
-            "aktiebolaget volvo": "Volvo Group. Azienda Svedese (AB). Cerca 'Investors'.",
-            "orkla asa": "Azienda Norvegese (ASA). Cerca 'Investor Relations'.",
-            "aktiebolaget electrolux": "Electrolux. Azienda Svedese (AB). Cerca 'Investors'.",
-            "assa abloy ab": "Azienda Svedese (AB). Cerca 'Investors'.",
-            "telefonaktiebolaget lm ericsson": "Ericsson. Azienda Svedese (AB). Cerca 'Investors'.",
-            "husqvarna ab": "Azienda Svedese (AB). Cerca 'Investors'.",
-            "alfa laval ab": "Azienda Svedese (AB). Cerca 'Investors'.",
-            "iss a/s": "Azienda Danese (A/S). Cerca 'Investor Relations'.",
-            "vestas wind systems a/s": "Azienda Danese (A/S). Cerca 'Investors'.",
-            "yara international asa": "Azienda Norvegese (ASA). Cerca 'Investor Relations'.",
-            "norsk hydro asa": "Azienda Norvegese (ASA). Cerca 'Investors'.",
-            "a.p. moller - maersk": "Maersk. Azienda Danese (A/S). Cerca 'Investor Relations'.",
-            "carlsberg a/s": "Azienda Danese (A/S). Cerca 'Investors'.",
-            # Esempi UK (PLC)
-            "bp p.l.c.": "Azienda UK (PLC). Cerca 'Investors'.",
-            "john wood group plc": "Azienda UK (PLC). Cerca 'Investors'.",
-            "vodafone group plc": "Azienda UK (PLC). Cerca 'Investors'. FY finisce Marzo.",
-            "british american tobacco plc": "BAT. Azienda UK (PLC). Cerca 'Investors'.",
-            "iwg plc": "Regus. Azienda UK/Globale (PLC, sede Svizzera?). Cerca 'Investors'.",
-            "3i group plc": "Azienda UK (PLC). Cerca 'Investors'. FY finisce Marzo.",
-            "gsk plc": "GlaxoSmithKline. Azienda UK (PLC). Cerca 'Investors'.",
-            "intertek group plc": "Azienda UK (PLC). Cerca 'Investors'.",
-            "relx plc": "Azienda UK/Olandese (PLC/NV). Cerca 'Investors'.",
-            "astrazeneca plc": "Azienda UK/Svedese (PLC). Cerca 'Investors'.",
-            "unilever plc": "Azienda UK (PLC). Cerca 'Investors'.",  # Anche NV olandese storicamente
-            # Altri / Privati / Difficili
-            "ferrero": "Azienda Italiana/Lussemburghese (privata). Dati finanziari pubblici limitati.",
-            "cargill": "Azienda USA (privata). Dati limitati.",
-            "fletcher group": "Potrebbe riferirsi a Fletcher Building (Nuova Zelanda) o altri. Specificare se possibile.",
-            "advance properties": "Nome generico, potrebbe essere immobiliare privata. Dati limitati.",
-            "zf friedrichshafen": "Azienda Tedesca (Fondazione/AG?). Cerca 'Unternehmen', 'Presse'.",
-            "edizione": "Holding Famiglia Benetton (Italia). Dati potrebbero essere per le controllate (es. Mundys/Atlantia).",
-            "atlas uk bidco limited": "Veicolo di acquisizione UK. Probabilmente non ha report propri, cercare la parent company.",
-            # Mantieni gli originali se non sovrascritti
-            "apple inc.": "Azienda USA. Focus su SEC filings (10-K per Annual, 10-Q per Quarterly) e pagina IR ufficiale: investor.apple.com. Anno fiscale termina a fine Settembre.",  # noqa: E501
-            # Siemens già coperto sopra
-            # Toyota già coperto sopra
-            # Unilever già coperto sopra
-        }
-
-        # Cerca una corrispondenza (case-insensitive)
-        normalized_company_name = company_name.lower()
-        for key, value in known_info.items():
-            # Match if the key is contained in the normalized company name
-            # Should we prioritize longer/more complete matches if multiple keys are possible?
-            # For now, we use the first match found.
-            if key in normalized_company_name:
-                logger.debug(f"Found specific hint for '{company_name}' based on the key '{key}'")  # noqa: G004
-                return value  # Ritorna l'hint trovato
-
-        return None  # No info found for this company
+        return _lookup_company_info(_normalize_company_name(company_name))
 
     def generate_web_scraping_prompt(self, company_name: str, variable: str) -> str:
         """Generate a web scraping prompt based on the company name and source type."""
-        return self.web_scraping_prompt_template.format(company_name=company_name, variable=variable)
-
-    def call(self, prompt: str) -> generation_types.GenerateContentResponse | None:
-        """ "Call the model with retry logic for handling quota issues."""  # noqa: D210
-        retries = 0
-        self.inizialize_model()
-        while retries < self.max_retries:
-            response = None
-            try:
-                response = self.model.generate_content(prompt)
-            except ResourceExhausted as e:
-                logger.warning("Quota exceeded: %s", e.message)
-                # Try to extract retry delay from exception, or default to 60 seconds
-                delay = getattr(e, "retry_delay", 60)
-                delay = delay.seconds if hasattr(delay, "seconds") else 60
-                logger.info("Retrying in %d seconds... (attempt %d of %d)", delay, retries + 1, self.max_retries)
-                time.sleep(delay)
-            except Exception:
-                logger.exception("Unhandled exception during model call")
-                break
-
-            if response:
-                logger.info("Response received successfully.")
-                return response
-
-            retries += 1
-
-        logger.error("Failed to get a response after %d retries.", self.max_retries)
-        return None
+        return _web_scraping_prompt(self.web_scraping_prompt_template, company_name, variable)
+
+    def call(self, prompt: str, *, refresh: bool = False) -> generation_types.GenerateContentResponse | CachedResponse | None:
+        """
+        Call the model, retrying quota and other transient errors with exponential backoff.
+
+        With `use_response_cache` enabled, the answer is kept on disk keyed by the prompt and served again
+        to the next calls with the same prompt, also across runs.
+
+        Args:
+            prompt (str): Prompt to send.
+            refresh (bool): Skip the cached answer, e.g. to retry after it was rejected, and cache the new one.
+
+        Returns
+        -------
+            GenerateContentResponse | CachedResponse | None: The answer, None if every attempt failed.
+        """
+        cache_key = ResponseCache.make_key(prompt=prompt) if self.use_response_cache else None
+        if cache_key and not refresh:
+            cached_text = self.response_cache.get(cache_key)
+            if cached_text is not None:
+                logger.info("Using cached model response")
+                return CachedResponse(cached_text)
+
+        response = generate_with_retry(self.initialize_model(), prompt, self.config)
+        if cache_key:
+            text = self._response_text(response)
+            if text:
+                self.response_cache.set(cache_key, text)
+        return response
+
+    def call_batch(self, prompts: list[str]) -> list[str | None]:
+        """
+        Answer several independent prompts with as few requests as possible.
+
+        The prompts are grouped, up to `max_batch_size` prompts and `max_batch_chars` characters per request,
+        and the model is asked for a JSON array with one answer per prompt. A group whose answer cannot be
+        split back into one item per prompt is sent again one prompt at a time.
+
+        Args:
+            prompts (list): Prompts to answer, each one expecting a JSON object as response.
+
+        Returns
+        -------
+            list: Text of the answer to each prompt (None if it failed), in the same order as the prompts.
+        """
+        answers: list[str | None] = []
+        for group in self._batch_groups(prompts):
+            group_answers: list[str | None] | None = self._call_group(group) if len(group) > 1 else None
+            if group_answers is None:
+                group_answers = [self._response_text(self.call(prompt)) for prompt in group]
+            answers.extend(group_answers)
+        return answers
+
+    def _batch_groups(self, prompts: list[str]) -> list[list[str]]:
+        """Split the prompts in groups respecting the size limits of a batched request."""
+        groups: list[list[str]] = []
+        group: list[str] = []
+        group_chars = 0
+        for prompt in prompts:
+            if group and (len(group) >= self.max_batch_size or group_chars + len(prompt) > self.max_batch_chars):
+                groups.append(group)
+                group, group_chars = [], 0
+            group.append(prompt)
+            group_chars += len(prompt)
+        if group:
+            groups.append(group)
+        return groups
+
+    def _call_group(self, prompts: list[str]) -> list[str | None] | None:
+        """Send a group of prompts in a single request, return None if the answer does not match the prompts."""
+        batch_prompt = self.batch_prompt_header.format(task_count=len(prompts)) + "".join(
+            f"\n[TASK {index}]\n{prompt}\n" for index, prompt in enumerate(prompts, start=1)
+        )
+        text = self._response_text(self.call(batch_prompt))
+        if text is None:
+            return None
+        try:
+            items = orjson.loads(_JSON_FENCE_RE.sub("", text.strip()))
+        except orjson.JSONDecodeError:
+            logger.warning("Unable to parse the batched response, falling back to single requests")
+            return None
+        if not isinstance(items, list) or len(items) != len(prompts):
+            logger.warning("Batched response does not match the %d prompts, falling back to single requests", len(prompts))
+            return None
+        return [item if isinstance(item, str) else orjson.dumps(item).decode() for item in items]
+
+    @staticmethod
+    def _response_text(response: generation_types.GenerateContentResponse | CachedResponse | None) -> str | None:
+        """Return the text of a response, None if missing."""
+        if response is None:
+            return None
+        try:
+            return response.text or None
+        except ValueError:  # Blocked or empty candidates
+            logger.warning("Response without text: %s", response)
+            return None
@@ -3,11 +3,14 @@
 import logging
 import secrets
 import sys
+import threading
 import time
 
 import google.generativeai as genai
-from google.api_core.exceptions import ResourceExhausted
+from google.api_core.exceptions import DeadlineExceeded, InternalServerError, ResourceExhausted, ServiceUnavailable
 from google.generativeai.types import generation_types
+from model.prompt_generator import compile_template
+from model.retry import backoff_delay
 from prompts.base_prompt import base_prompt_improving
 from prompts.prompt_improving import improve_prompt
 from utils import load_config_yaml
@@ -23,6 +26,10 @@ logger = logging.getLogger(__name__)
 class PromptTuner:
     """Module for automatic prompt optimization based on feedback."""
 
+    # Models shared by all the tuners, built once per model name
+    _model_pool: dict[str, genai.GenerativeModel] = {}  # noqa: RUF012
+    _model_pool_lock = threading.Lock()
+
     def __init__(self, initial_prompt_template: str | None = None):
         """Initialize the PromptTuner with a default prompt template.
 
@@ -36,9 +43,30 @@ class PromptTuner:
         self.max_retries = self.config["max_retries"]
         self.models_name = self.config["models_name"]
         self.selected_model_name = secrets.choice(self.models_name)
-        self.model = genai.GenerativeModel(self.selected_model_name)
+        # Built on the first call, most runs never tune the prompt
+        self.model: genai.GenerativeModel | None = None
         logger.info("Selected model: %s", self.selected_model_name)
 
+    @classmethod
+    def _pooled_model(cls, model_name: str) -> genai.GenerativeModel:
+        """Return the shared model for the name, building it on first use."""
+        with cls._model_pool_lock:
+            model = cls._model_pool.get(model_name)
+            if model is None:
+                model = genai.GenerativeModel(model_name)
+                cls._model_pool[model_name] = model
+            return model
+
+    def _rotate_model(self) -> bool:
+        """Switch to another of `models_name` after a quota error, return False if there is no other model."""
+        other_models = [name for name in self.models_name if name != self.selected_model_name]
+        if not other_models:
+            return False
+        self.selected_model_name = secrets.choice(other_models)
+        self.model = self._pooled_model(self.selected_model_name)
+        logger.info("Switching to model: %s", self.selected_model_name)
+        return True
+
     def generate_prompt(self, company_name: str, source_type: str) -> str:
         """
         Generate the full prompt for the given company and source type.
@@ -51,7 +79,8 @@ class PromptTuner:
         -------
             str: The full prompt with the company name and source type filled in
         """
-        return self.current_prompt.format(company_name=company_name, source_type=source_type)
+        # The template is parsed once, and again only when `current_prompt` changes
+        return compile_template(self.current_prompt)(company_name=company_name, source_type=source_type)
 
     def improve_prompt(self, report_url, company_name, variable):
         """Improves the current prompt using feedback from Gemini.
@@ -66,10 +95,7 @@ class PromptTuner:
             str: New improved prompt
         """
         # Modifichiamo il template per includere la variabile da estrarre
-        improved_template = improve_prompt.format(
-            report_url=report_url, 
-            company_name=company_name
-        )
+        improved_template = compile_template(improve_prompt)(report_url=report_url, company_name=company_name)
         
         # Aggiungiamo informazioni sulla variabile specifica da estrarre
         improved_template += f"\n\nSpecifically, we are looking for the {variable} information for this company."
@@ -77,7 +103,14 @@ class PromptTuner:
         return improved_template
 
     def call(self, prompt: str) -> generation_types.GenerateContentResponse | None:
-        """Call the model with the given prompt and handle retries for quota errors."""
+        """
+        Call the model with the given prompt, retrying the quota and transient errors.
+
+        The transient errors (5xx, deadline, connection) are retried with exponential backoff, any other
+        error is fatal and raised.
+        """
+        if self.model is None:
+            self.model = self._pooled_model(self.selected_model_name)
         retries = 0
         while retries < self.max_retries:
             response = None
@@ -85,14 +118,21 @@ class PromptTuner:
                 response = self.model.generate_content(prompt)
             except ResourceExhausted as e:
                 logger.warning("Quota exceeded: %s", e.message)
-                # Try to extract retry delay from exception, or default to 60 seconds
-                delay = getattr(e, "retry_delay", 60)
-                delay = delay.seconds if hasattr(delay, "seconds") else 60
-                logger.info("Retrying in %d seconds... (attempt %d of %d)", delay, retries + 1, self.max_retries)
+                # The quota is per model: retry at once on another model, otherwise wait for this one
+                if not self._rotate_model():
+                    # Try to extract retry delay from exception, or default to 60 seconds
+                    delay = getattr(e, "retry_delay", 60)
+                    delay = delay.seconds if hasattr(delay, "seconds") else 60
+                    logger.info("Retrying in %d seconds... (attempt %d of %d)", delay, retries + 1, self.max_retries)
+                    time.sleep(delay)
+            except (ServiceUnavailable, InternalServerError, DeadlineExceeded, ConnectionError, TimeoutError) as e:
+                delay = backoff_delay(retries, self.config["retry_base_delay"], self.config["retry_max_delay"])
+                logger.warning("Transient error from the model: %s", e)
+                logger.info("Retrying in %.1f seconds... (attempt %d of %d)", delay, retries + 1, self.max_retries)
                 time.sleep(delay)
-            except Exception as e:
-                logger.exception("Unhandled exception during model call: %s", e)  # noqa: TRY401
-                break  # Or re-raise depending on your error handling policy
+            except Exception:
+                logger.exception("Unhandled exception during model call")
+                raise
 
             if response:
                 logger.info("Response received successfully.")
@@ -0,0 +1,73 @@
+"""Client side rate limiting of the Gemini API calls."""
+
+import functools
+import threading
+import time
+
+
+class GeminiLimiter:
+    """
+    Token bucket shared by all the threads calling the model.
+
+    The rate adapts to the quota errors (AIMD): a quota error halves it and pauses every caller for the
+    delay requested by the server, each successful call then raises it back by a small step.
+    """
+
+    def __init__(self, requests_per_minute: float, min_requests_per_minute: float, burst: int):
+        """
+        Initialize the limiter with a full bucket.
+
+        Args:
+            requests_per_minute (float): Maximum rate, the quota of the API key.
+            min_requests_per_minute (float): Floor of the rate when it is halved by the quota errors.
+            burst (int): Requests that can be sent at once after a quiet period.
+        """
+        self.max_rate = requests_per_minute / 60
+        self.min_rate = min_requests_per_minute / 60
+        self.rate = self.max_rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.last_refill = time.monotonic()
+        self.resume_at = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Block until a request can be sent, taking a token from the bucket."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                wait = self.resume_at - now
+                if wait <= 0:
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def on_success(self) -> None:
+        """Additive increase of the rate after a successful call."""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+    def on_quota_error(self, retry_after: float) -> None:
+        """Multiplicative decrease of the rate, and pause of every caller for `retry_after` seconds."""
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = 0.0
+            self.resume_at = max(self.resume_at, time.monotonic() + retry_after)
+
+    def _refill(self, now: float) -> None:
+        """Add the tokens earned since the last refill, the lock must be held."""
+        self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+
+@functools.cache
+def _shared_limiter(requests_per_minute: float, min_requests_per_minute: float, burst: int) -> GeminiLimiter:
+    return GeminiLimiter(requests_per_minute, min_requests_per_minute, burst)
+
+
+def get_limiter(config: dict) -> GeminiLimiter:
+    """Return the limiter shared by all the callers using the same model configuration."""
+    return _shared_limiter(config["requests_per_minute"], config["min_requests_per_minute"], config["rate_limit_burst"])
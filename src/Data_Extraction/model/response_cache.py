@@ -0,0 +1,78 @@
+"""Persistent cache for the model responses and the downloaded pages."""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+
+class CachedResponse:
+    """Response served from the cache, exposing its text like a `GenerateContentResponse`."""
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class ResponseCache:
+    """
+    Cache the model responses on disk, keyed by a hash of the request.
+
+    Every entry is a small JSON file named after its key, written atomically, so concurrent
+    writers never corrupt the cache and a new entry does not rewrite the others.
+    """
+
+    def __init__(self, cache_dir: str, max_age: float | None = None, *, in_memory: bool = True):
+        """
+        Initialize the cache.
+
+        Args:
+            cache_dir (str): Directory holding one JSON file per cached response.
+            max_age (float): Seconds after which an entry is stale and ignored, None to keep the entries forever.
+            in_memory (bool): Also keep the entries read or written in memory, disable it for large entries.
+        """
+        self.cache_dir = Path(cache_dir)
+        self.max_age = max_age
+        self.in_memory = in_memory
+        self._entries: dict[str, str] = {}
+
+    @staticmethod
+    def make_key(**request: Any) -> str:
+        """Build a stable key from the request parameters (model, prompt, generation config)."""
+        payload = json.dumps(request, sort_keys=True, default=str)
+        return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        """Return the cached response for the key, if any."""
+        if key in self._entries:
+            return self._entries[key]
+        entry_path = self.cache_dir / f"{key}.json"
+        try:
+            if self.max_age is not None and time.time() - entry_path.stat().st_mtime > self.max_age:
+                return None
+            with entry_path.open("r", encoding="utf-8") as f:
+                text = json.load(f)["text"]
+        except FileNotFoundError:
+            return None
+        except (json.JSONDecodeError, KeyError, TypeError):
+            logger.warning("Corrupted response cache entry %s, ignoring it", entry_path)
+            return None
+        if self.in_memory:
+            self._entries[key] = text
+        return text
+
+    def set(self, key: str, response_text: str) -> None:
+        """Store the response for the key and persist it."""
+        if self.in_memory:
+            self._entries[key] = response_text
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file first, the rename makes the entry visible all at once
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"text": response_text}, f)
+        Path(tmp_path).replace(self.cache_dir / f"{key}.json")
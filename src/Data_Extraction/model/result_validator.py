@@ -2,10 +2,13 @@
 
 import json
 import logging
-import re
 import sys
+import threading
 
 import google.generativeai as genai
+import orjson
+from model.prompt_generator import configure_client
+from model.retry import generate_with_retry
 from prompts.validation_prompt import generate_validation_prompt
 from utils import load_config_yaml
 
@@ -16,6 +19,8 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+_JSON_DECODER = json.JSONDecoder()
+
 
 class ResultValidator:
     """Module for validating results using the Gemini API."""
@@ -23,8 +28,20 @@ class ResultValidator:
     def __init__(self):
         """Initialize the result validator."""
         # Utilizziamo Gemini invece di Mistral
-        self.config = load_config_yaml("src/Data_Discovery/config/model_config/config.yaml")
-        self.model_name = self.config.get("model_name")
+        self.config = load_config_yaml("src/Data_Extraction/config/model_config/config.yaml")
+        self.model_name = self.config["models_name"][0]
+        # Created on first use by `_get_model`
+        self._model: genai.GenerativeModel | None = None
+        self._lock = threading.Lock()
+
+    def _get_model(self) -> genai.GenerativeModel:
+        """Return the validation model, creating it on first use."""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    configure_client()
+                    self._model = genai.GenerativeModel(self.model_name)
+        return self._model
 
     def validate_result(self, company_name, source_type, scraping_result):
         """
@@ -55,8 +72,7 @@ class ResultValidator:
 
         try:
             # Use the Gemini API to validate the result
-            model = genai.GenerativeModel(self.model_name)
-            response = model.generate_content(validation_prompt)
+            response = generate_with_retry(self._get_model(), validation_prompt, self.config)
 
             if response:
                 validation_text = response.text
@@ -89,13 +105,17 @@ class ResultValidator:
 
     def _extract_json_from_text(self, text: str) -> dict | None:
         """Extract JSON from the text response."""
+        start = text.find("{")
+        if start != -1:
+            try:
+                # Decode the object starting at the first brace in a single pass, ignoring the text after it
+                result, _ = _JSON_DECODER.raw_decode(text, start)
+            except json.JSONDecodeError:
+                logger.debug("No JSON object at the first brace, parsing the whole response")
+            else:
+                return result
         try:
-            json_pattern = r"({[\s\S]*})"
-            match = re.search(json_pattern, text)
-            if match:
-                json_str = match.group(1)
-                return json.loads(json_str)
-            return json.loads(text)
-        except json.JSONDecodeError as e:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError as e:
             logger.warning("Unable to extract JSON from the response: %s", e)
             return None
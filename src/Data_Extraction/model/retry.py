@@ -0,0 +1,101 @@
+"""Retry policy for the Gemini API calls."""
+
+import functools
+import logging
+import random
+import threading
+import time
+from typing import Any
+
+from google.api_core.exceptions import DeadlineExceeded, InternalServerError, ResourceExhausted, ServiceUnavailable
+from google.generativeai.types import generation_types
+from model.rate_limiter import get_limiter
+
+logger = logging.getLogger(__name__)
+
+# Transient errors worth another attempt, anything else (auth, invalid argument, ...) is fatal
+RETRYABLE_ERRORS = (ResourceExhausted, ServiceUnavailable, InternalServerError, DeadlineExceeded, ConnectionError, TimeoutError)
+
+
+@functools.cache
+def _call_slots(max_concurrency: int) -> threading.BoundedSemaphore:
+    """Return the semaphore shared by the threads to bound the requests in flight."""
+    return threading.BoundedSemaphore(max_concurrency)
+
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    """
+    Compute the capped exponential backoff for the given attempt, with up to 20% of positive jitter.
+
+    The jitter spreads the retries of concurrent callers instead of re-submitting them all at once.
+    """
+    delay = min(max_delay, base_delay * 2**attempt)
+    return delay * (1 + random.random() * 0.2)  # noqa: S311
+
+
+def server_retry_delay(error: Exception) -> float | None:
+    """Return the retry delay suggested by the server in a quota error (RetryInfo or Retry-After header), if any."""
+    retry_delay = getattr(error, "retry_delay", None)
+    seconds = getattr(retry_delay, "seconds", None)
+    if seconds is not None:
+        return seconds
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    retry_after = headers.get("Retry-After")
+    if retry_after is None:
+        return None
+    try:
+        return float(retry_after)
+    except ValueError:  # An HTTP date, which the API does not send
+        return None
+
+
+def generate_with_retry(model: Any, prompt: str, config: dict, **kwargs: Any) -> generation_types.GenerateContentResponse | None:
+    """
+    Call `model.generate_content`, retrying the transient errors with exponential backoff.
+
+    The calls of all the threads share at most `max_concurrency` slots and the rate of the shared `GeminiLimiter`.
+
+    Args:
+        model (GenerativeModel): Model to call.
+        prompt (str): Prompt to send.
+        config (dict): Model configuration, providing the retry, concurrency and rate limit settings.
+        **kwargs: Extra arguments for `generate_content`.
+
+    Returns
+    -------
+        GenerateContentResponse | None: The response, or None if every attempt failed.
+    """
+    max_retries = config["max_retries"]
+    limiter = get_limiter(config)
+    for attempt in range(max_retries):
+        limiter.acquire()
+        try:
+            with _call_slots(config["max_concurrency"]):
+                response = model.generate_content(prompt, **kwargs)
+        except RETRYABLE_ERRORS as e:
+            delay = backoff_delay(attempt, config["retry_base_delay"], config["retry_max_delay"])
+            # The delay suggested by the server is a floor, retrying earlier would fail again
+            delay = max(delay, server_retry_delay(e) or 0)
+            if isinstance(e, ResourceExhausted):
+                # The quota is shared, the other threads slow down too instead of hitting it again
+                limiter.on_quota_error(delay)
+            logger.warning("Transient error from the model: %s", e)
+            if attempt == max_retries - 1:
+                # No attempt left, waiting would only hold the caller
+                break
+            logger.info("Retrying in %.1f seconds... (attempt %d of %d)", delay, attempt + 1, max_retries)
+            time.sleep(delay)
+            continue
+        except Exception:
+            logger.exception("Unhandled exception during model call")
+            break
+
+        limiter.on_success()
+        if response:
+            # Not available on streamed responses until they are consumed
+            usage = getattr(response, "usage_metadata", None)
+            logger.info("Response received successfully (%s prompt tokens).", getattr(usage, "prompt_token_count", "unknown"))
+            return response
+
+    logger.error("Failed to get a response after %d retries.", max_retries)
+    return None
@@ -4,10 +4,27 @@
 # TODO: Continua il prompt per migliorare la ricerca di fonti finanziarie
 base_prompt_improving = """You are a FINANCIAL DATA EXPERT tasked with improving the prompt for finding financial data sources.""" 
 
+# Static part of the optimization request: it must stay at the head of the request, before any
+# company specific content, so that consecutive requests share the same prefix (provider prompt caching).
+# It is concatenated and never formatted, the placeholders below are literal.
+optimization_request_header = base_prompt_improving + """
+
+INSTRUCTIONS FOR OPTIMIZATION:
+1. Analyze the feedback received on the result produced by the current prompt.
+2. Use the scraping results as hints on the domain, the fiscal year and the type of source to target.
+3. Keep the placeholders {company_name} and {variable} in the new prompt, they are filled in later.
+4. Keep the required JSON response format (url, value, currency, year) unchanged.
+5. Make the instructions more specific to solve the problems highlighted in the feedback.
+
+RETURN ONLY THE NEW OPTIMIZED PROMPT, without explanations or comments.
+"""
+
+# The instructions come first and the company specific fields last, so the prompts of all the
+# companies share the same prefix (provider prompt caching).
 base_prompt_template = """
 YOU ARE A FINANCIAL RESEARCH EXPERT specializing in locating authoritative and official financial data sources for multinational companies.
 
-TASK: Identify the most authoritative, specific, and up-to-date financial data source for "{company_name}" targeting the variable {variable}.
+TASK: Identify the most authoritative, specific, and up-to-date financial data source for the company and the variable given at the end.
 
 INSTRUCTIONS:
 
@@ -17,6 +34,20 @@ INSTRUCTIONS:
 - "value": The financial value extracted from the source, formatted according to the variable type (e.g., ISO country code, integer, NACE code, URL). Must be provided as a full integer number.
 - "currency": The currency in ISO 4217 format (e.g., USD, EUR) if applicable, otherwise an empty string.
 - "year": The reporting year or year of data, formatted as YYYY, otherwise an empty string.
+
+COMPANY: "{company_name}"
+VARIABLE: {variable}
+"""
+
+# Short variant of `base_prompt_template`, selected with `prompt_variant: minimal` in the model config
+base_prompt_minimal = """
+Return only a JSON object {{"url", "value", "currency", "year"}} with the most authoritative official source
+of the variable {variable} for the company "{company_name}":
+- "url": the direct link to the page holding the data.
+- "value": the full integer value (or the ISO country code, NACE code or URL).
+- "currency": the ISO 4217 code or "".
+- "year": as YYYY or "".
+No prose.
 """
 
 web_scraping_prompt = """
@@ -96,3 +127,12 @@ Save the final dictionary output in the variable named `result`.
 Always prefer: Official IR page > Government registry > Specific financial document > Wikipedia/aggregator
 
 """
+
+# Header of a request grouping several independent prompts, the tasks are appended after it
+batch_prompt_header = """
+You will receive {task_count} independent tasks, each one introduced by [TASK n].
+Solve every task on its own, as if it was the only request.
+
+Respond with a JSON array of exactly {task_count} objects, one per task and in the same order as the tasks.
+Each object must follow the response format requested by its task. Return only the JSON array.
+"""
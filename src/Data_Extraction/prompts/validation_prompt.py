@@ -1,8 +1,11 @@
 """Validation prompt for financial data sources."""
 
+import functools
 
+
+@functools.lru_cache(maxsize=1024)
 def generate_validation_prompt(company_name: str, source_type: str, url: str, year: int, source_description: str, confidence: str) -> str:
-    """Generate a prompt for validating financial data sources."""
+    """Generate a prompt for validating financial data sources, cached per set of arguments."""
     return f"""
             You are an EXPERT VALIDATOR of financial sources for multinational companies.
 
@@ -1,17 +1,11 @@
 """Main module for the Financial Sources Finder project."""
 
-import json
 import logging
-import os
 import sys
-from pathlib import Path
-from time import time
-from typing import Any
+import threading
 
-import google.generativeai as genai
+from model.prompt_generator import configure_client
 from scraping.scraping_challenge import WebScraperModule
-from tqdm import tqdm
-from utils import save_json_obj
 
 logging.basicConfig(
     level=logging.INFO,
@@ -24,55 +18,59 @@ logger = logging.getLogger(__name__)
 class FinancialSourcesFinder:
     """Classe principale che coordina il processo di ricerca delle fonti finanziarie."""
 
-    def __init__(self, api_key: str | None = None, max_tuning_iterations: int = 3, validation_threshold: int = 80):
+    def __init__(self, api_key: str | None = None, max_workers: int | None = None):
         """
         Initialize the finder with the necessary configurations.
 
         Args:
             api_key (str): API key for Gemini (optional if already configured)
-            max_tuning_iterations (int): Maximum number of tuning iterations
-            validation_threshold (int): Validation threshold (0-100)
+            max_workers (int): Number of companies scraped in parallel (from the scraping config if None)
         """
-        if api_key:
-            genai.configure(api_key=api_key)
+        configure_client(api_key)
 
-        self.scraper = WebScraperModule()
-        self.max_tuning_iterations = max_tuning_iterations
-        self.validation_threshold = validation_threshold
+        self.scraper = WebScraperModule(max_workers=max_workers)
+        # Results of this run per (company_name, variable), the input repeats the pairs across rows
+        self._results: dict[tuple[str, str], tuple] = {}
+        self._results_lock = threading.Lock()
 
-    def _load_existing_report(self, report_path: Path) -> dict[str, Any]:
+    def find_financial_source(self, company_name: str, variable: str) -> tuple:
         """
-        Load an existing report from the specified path.
+        Find the financial source for a company with automatic tuning.
 
         Args:
-            report_path (Path): Path to the report file.
+            company_name (str): Name of the company.
+            variable (str): Variable to extract (COUNTRY, EMPLOYEES, TURNOVER, etc.).
 
         Returns
         -------
-            dict: Loaded report data.
+            tuple: (url, value, currency, refyear, page_status) of the source found.
         """
-        with report_path.open("r") as f:
-            try:
-                data = json.load(f)
-                if not isinstance(data, list):
-                    data = [data]  # Wrap single dict into a list
-            except json.JSONDecodeError:
-                data = []
-        return data
-
-    def find_financial_source(self, company_name: str, variable: str) -> dict[str, Any]:
+        with self._results_lock:
+            result = self._results.get((company_name, variable))
+        if result is None:
+            result = self.scraper.scrape_financial_sources(company_name, variable)
+            with self._results_lock:
+                self._results[company_name, variable] = result
+        return result
+
+    def find_financial_sources_batch(self, pairs: list[tuple[str, str]]) -> list[tuple]:
         """
-        Find the financial source for a company with automatic tuning.
+        Find the financial sources for several companies, batching the requests to the AI.
+
+        Each (company_name, variable) pair is searched once per run, the repeated pairs reuse the first result.
 
         Args:
-            company_name (str): Name of the company.
-            source_type (str): Type of financial source.
+            pairs (list): Tuples of (company_name, variable).
 
         Returns
         -------
-            dict: Final result with URL, yaear, and metadata.
+            list: (url, value, currency, refyear, page_status) for each pair, in the same order.
         """
-        url, value, currency, refyear, page_status = self.scraper.scrape_financial_sources(company_name, variable)
-
-
-        return url, value, currency, refyear, page_status
+        with self._results_lock:
+            missing = [pair for pair in dict.fromkeys(pairs) if pair not in self._results]
+        if missing:
+            results = self.scraper.scrape_financial_sources_batch(missing)
+            with self._results_lock:
+                self._results.update(zip(missing, results, strict=True))
+        with self._results_lock:
+            return [self._results[pair] for pair in pairs]
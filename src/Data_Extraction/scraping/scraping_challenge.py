@@ -1,21 +1,27 @@
 """Claude Challenge Code for scraping financial data sources."""
 
+import hashlib
 import json
 import logging
+import os
 import re
 import secrets
+import subprocess
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Any
 
+import orjson
 import requests
+from model.prompt_generator import PromptGenerator
+from model.prompt_tuner import PromptTuner
+from model.response_cache import ResponseCache
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 from utils import load_config_yaml, save_code
 
-from model.prompt_generator import PromptGenerator
-from model.prompt_tuner import PromptTuner
-
 # Logging configuration
 logging.basicConfig(
     level=logging.INFO,
@@ -24,25 +30,61 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Markdown fences wrapped by the AI around the generated code and the JSON answers
+_CODE_FENCE_RE = re.compile(r"^```(?:python)?|```$", re.MULTILINE)
+_JSON_FENCE_RE = re.compile(r"^```(?:json)?|```$", re.IGNORECASE)
+
+# The generated code runs in a child process, this footer prints its `result` on a marked stdout line
+_RESULT_MARKER = "__SCRAPING_RESULT__:"
+_RESULT_FOOTER = f"""
+
+import json as _result_json
+print({_RESULT_MARKER!r} + _result_json.dumps(globals().get("result"), default=str))
+"""
+
+# Status codes of a missing page, and of a server refusing HEAD requests (some block them with a 403)
+_NOT_FOUND_STATUS_CODES = frozenset({403, 404, 410})
+_HEAD_REFUSED_STATUS_CODES = frozenset({403, 405, 501})
+
 
 class WebScraperModule:
     """Module for web scraping financial data sources."""
 
-    def __init__(self):
+    def __init__(self, max_workers: int | None = None):
         """
         Initialize the web scraper with necessary configurations.
 
         Args:
-            user_agent (str): User agent da utilizzare per le richieste HTTP
-            timeout (int): Timeout in secondi per le richieste
-            max_retries (int): Numero massimo di tentativi per le richieste.
+            max_workers (int): Number of companies scraped in parallel by `scrape_many`, from the config if None.
         """
         self.session = requests.Session()
         self.config = load_config_yaml("src/Data_Extraction/config/scraping_config/config.yaml")
         self.timeout = self.config["timeout"]
+        self.code_timeout = self.config["code_timeout"]
+        self.persist_generated_code = self.config["persist_generated_code"]
         self.max_retries = self.config["max_retries"]
+        self.max_workers = max_workers or self.config["max_workers"]
+        # Long lived pool for the URL probes, its threads are started on demand and reused across batches
+        self._probe_executor = ThreadPoolExecutor(max_workers=self.config["probe_workers"], thread_name_prefix="probe")
+        # The session is shared by the worker threads, keep enough connections for all of them
+        retries = Retry(
+            total=self.max_retries,
+            backoff_factor=1,
+            status_forcelist=[429, 500, 502, 503, 504],
+            respect_retry_after_header=True,
+            raise_on_status=False,  # Return the last response once the retries are exhausted
+        )
+        # --threads may exceed the configured pool, a worker without a pooled connection would reconnect every time
+        pool_maxsize = max(self.config["pool_maxsize"], self.max_workers)
+        adapter = HTTPAdapter(max_retries=retries, pool_connections=pool_maxsize, pool_maxsize=pool_maxsize)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
         self.prompt_generator = PromptGenerator()
         self.prompt_tuner = PromptTuner()
+        # Final results per company and variable, they expire as the company pages change
+        self.result_cache = ResponseCache(self.config["result_cache_dir"], max_age=self.config["result_cache_max_age_days"] * 86400)
+        # Version of the base prompt in use, part of the key of the cached results
+        self._prompt_version = hashlib.blake2b(self.prompt_generator.base_prompt_template.encode("utf-8"), digest_size=8).hexdigest()
         user_agents = self.config["user_agents"]
         # Random choice of agents, random generator are not suitable for cryptography https://docs.astral.sh/ruff/rules/suspicious-non-cryptographic-random-usage/
         user_agent = secrets.choice(user_agents)
@@ -60,89 +102,181 @@ class WebScraperModule:
         # Add the delay to avoid being blocked by the server
         self.request_delay = self.config["request_delay"]
 
-    def _create_retry_session(self) -> requests.Session:
-        """Create a requests session with retry strategy."""
-        session = requests.Session()
-        retries = Retry(total=self.max_retries, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504])
-        adapter = HTTPAdapter(max_retries=retries)
-        session.mount("http://", adapter)
-        session.mount("https://", adapter)
-        return session
-
-    def find_company_website_with_ai(self, company_name: str, variable: str) -> str | None:
+    def find_company_website_with_ai(self, company_name: str, variable: str, *, refresh: bool = False) -> str | None:
         """Use AI to find the official website of a company and extract specific variable information.
         
         Args:
             company_name (str): Name of the company
             variable (str): Variable to extract (COUNTRY, EMPLOYEES, TURNOVER, etc.)
+            refresh (bool): Ask the AI again instead of using the cached answer
         
-        Returns:
+        Returns
+        -------
             str | None: URL of the company's website or None if not found
         """
         try:
             # Utilizziamo variable per personalizzare il prompt in base al tipo di dato da estrarre
             prompt = self.prompt_generator.generate_prompt(company_name, variable = variable)
-            response = self.prompt_generator.call(prompt)
+            response = self.prompt_generator.call(prompt, refresh=refresh)
             if response and response.text:
-                return response.text.strip()
+                return response.text
         except Exception:
-            logger.exception(f"AI failed to find company website for {variable} extraction")
+            logger.exception("AI failed to find company website for %s extraction", variable)
         return None
 
-    def ai_web_scraping(self, company_name: str, variable: str) -> object | None:
-        """Generate and safely execute AI scraping code."""
+    def ai_web_scraping(self, company_name: str, variable: str, *, refresh: bool = False) -> dict | None:
+        """Generate and safely execute AI scraping code, `refresh` asks for new code instead of the cached one."""
         prompt = self.prompt_generator.generate_web_scraping_prompt(company_name, variable)
-        response = self.prompt_generator.call(prompt)
+        response = self.prompt_generator.call(prompt, refresh=refresh)
 
         if response is None or not hasattr(response, "text") or not response.text:
             logger.warning("Empty AI scraping response for %s", company_name)
             return None
 
-        code_text = re.sub(r"^```(?:python)?|```$", "", response.text.strip(), flags=re.MULTILINE)
-        Path("generated_code").mkdir(parents=True, exist_ok=True)
-        code_file_path = Path("generated_code") / f"{company_name}_{variable}.py"
+        code_text = self._clean_llm_payload(response.text, _CODE_FENCE_RE)
+        if self.persist_generated_code:
+            # Kept for inspection only, the code runs from memory without waiting for the write
+            code_file_path = Path("generated_code") / f"{company_name}_{variable}.py"
+            threading.Thread(target=self._save_generated_code, args=(code_text, code_file_path)).start()
+        return self._run_code(code_text, f"{company_name}_{variable}")
 
+    @staticmethod
+    def _save_generated_code(code_text: str, code_file_path: Path) -> None:
+        """Write a generated script to disk, logging the failures."""
         try:
+            code_file_path.parent.mkdir(parents=True, exist_ok=True)
             save_code(code_text, code_file_path)
-        except Exception:
+        except OSError:
             logger.exception("Failed to write AI-generated code")
-            return None
+        else:
+            logger.info("Generated scraping code saved to: %s", code_file_path)
+
+    def load_and_run_code(self, code_file_path: Path) -> dict | None:
+        """Run a generated Python script saved on disk, see `_run_code`."""
+        code = Path(code_file_path).read_text(encoding="utf-8")
+        return self._run_code(self._clean_llm_payload(code, _CODE_FENCE_RE), str(code_file_path))
 
-        logger.info("Generated scraping code saved to: %s", code_file_path)
-        return self.load_and_run_code(code_file_path)
+    def _run_code(self, code_text: str, label: str) -> dict | None:
+        """Run generated Python code in a separate process and return the `result` it sets.
 
-    def load_and_run_code(self, code_file_path: Path) -> object | None:
-        """Dynamically load and execute a Python script. Be cautious with this."""
+        The code is fed to the interpreter on stdin, nothing is written to disk. The process is killed after
+        `code_timeout` seconds, so a hanging request in the generated code cannot block the scraping, and its
+        globals and crashes stay in the child process.
+
+        Args:
+            code_text (str): Python source, without markdown fences
+            label (str): Name of the code in the logs
+        """
         try:
-            code = Path(code_file_path).read_text(encoding="utf-8")
-            code = re.sub(r"^```(?:python)?|```$", "", code.strip(), flags=re.MULTILINE)
+            completed = subprocess.run(
+                [sys.executable, "-"],
+                input=code_text + _RESULT_FOOTER,
+                capture_output=True,
+                text=True,
+                timeout=self.code_timeout,
+                env={**os.environ, "PYTHONHASHSEED": "0"},
+                check=False,
+            )
+        except subprocess.TimeoutExpired:
+            logger.warning("AI-generated code %s timed out after %d seconds", label, self.code_timeout)
+            return None
 
-            module_vars = {"__file__": code_file_path, "__name__": "__main__", "__package__": None}
-            exec(compile(code, code_file_path, "exec"), module_vars)  # noqa: S102
-            return module_vars.get("result")  # Assuming the script sets a variable named 'result'
-        except Exception:
-            logger.exception("Execution of AI-generated code failed")
+        if completed.returncode != 0:
+            logger.warning("Execution of AI-generated code %s failed:\n%s", label, completed.stderr[-2000:])
             return None
+        return self._parse_script_result(completed.stdout)
+
+    @staticmethod
+    def _parse_script_result(stdout: str) -> dict | None:
+        """Read the `result` printed by the footer of a generated script, None if missing or not a dictionary."""
+        for line in reversed(stdout.splitlines()):
+            if line.startswith(_RESULT_MARKER):
+                try:
+                    result = orjson.loads(line[len(_RESULT_MARKER) :])
+                except orjson.JSONDecodeError:
+                    break
+                return result if isinstance(result, dict) else None
+        logger.warning("AI-generated code did not produce a result")
+        return None
 
     def is_page_not_found(self, url: str) -> bool:
-        """Check if the URL returns a 403/404 error."""
+        """Check if the URL returns a 403/404/410 error, without downloading the page.
+
+        The page is probed with a HEAD request. When the server refuses it (403, 405, 501), it is probed again
+        with a GET limited to the first byte and closed before reading the body. Server errors (5xx) are
+        transient and do not mean that the page is missing.
+        """
         try:
-            response = self.session.get(url, timeout=self.timeout)
+            response = self.session.head(url, allow_redirects=True, timeout=self.timeout)
+            if response.status_code in _HEAD_REFUSED_STATUS_CODES:
+                response = self.session.get(url, headers={"Range": "bytes=0-0"}, stream=True, timeout=self.timeout)
+                response.close()
         except requests.RequestException as e:
             logger.warning("Failed to check URL: %s", e)
             return True
         else:
-            return response.status_code in (403, 404)
+            return response.status_code in _NOT_FOUND_STATUS_CODES
+
+    def pages_not_found(self, urls: list[str]) -> list[bool]:
+        """Check several URLs concurrently, see `is_page_not_found`.
+
+        Args:
+            urls (list): URLs to check
+
+        Returns
+        -------
+            list: True for each URL returning a 403/404/410 error or unreachable, in the same order
+        """
+        if len(urls) <= 1:
+            return [self.is_page_not_found(url) for url in urls]
+        return list(self._probe_executor.map(self.is_page_not_found, urls))
 
     def scrape_financial_sources(self, company_name: str, variable: str) -> Any:
         """Try to find financial sources using prompt tuning, fall back to AI scraping."""
+        cached_result = self._cached_result(company_name, variable)
+        if cached_result is not None:
+            logger.info("Using cached result for '%s' (%s)", company_name, variable)
+            return cached_result
+
         # First try with AI-based website finding and prompt improvement
         result = self.find_company_website_with_ai_and_improve(company_name, variable)
-        if result:
-            return result
-            
-        # If that fails, fall back to AI web scraping
-        return self.ai_web_scraping_with_retries(company_name, variable)
+        if not result:
+            # If that fails, fall back to AI web scraping
+            result = self.ai_web_scraping_with_retries(company_name, variable)
+
+        self._store_result(company_name, variable, result)
+        return result
+
+    def scrape_many(self, pairs: list[tuple[str, str]]) -> list[tuple]:
+        """Run `scrape_financial_sources` for several (company_name, variable) pairs in parallel threads.
+
+        Args:
+            pairs (list): Tuples of (company_name, variable) to scrape
+
+        Returns
+        -------
+            list: (url, value, currency, year, status) for each pair, in the same order
+        """
+        if len(pairs) <= 1:
+            return [self.scrape_financial_sources(company_name, variable) for company_name, variable in pairs]
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(pairs))) as executor:
+            return list(executor.map(self.scrape_financial_sources, *zip(*pairs, strict=True)))
+
+    def _cached_result(self, company_name: str, variable: str) -> tuple | None:
+        """Return the result found by a previous run for the company and variable, if any."""
+        if not self.prompt_generator.use_response_cache:
+            return None
+        cached = self.result_cache.get(self._result_key(company_name, variable))
+        return tuple(orjson.loads(cached)) if cached is not None else None
+
+    def _store_result(self, company_name: str, variable: str, result: tuple | None) -> None:
+        """Cache the result of the company and variable, only if it points to an existing page."""
+        if self.prompt_generator.use_response_cache and result and result[-1] == "Page found":
+            self.result_cache.set(self._result_key(company_name, variable), orjson.dumps(result).decode())
+
+    def _result_key(self, company_name: str, variable: str) -> str:
+        """Return the cache key of a result, a change of the base prompt invalidates the results found with the previous one."""
+        return ResponseCache.make_key(result_of=company_name, variable=variable, prompt_version=self._prompt_version)
 
     def find_company_website_with_ai_and_improve(self, company_name: str, variable: str) -> tuple | None:
         """Find company website using AI with prompt improvement on failure.
@@ -151,14 +285,16 @@ class WebScraperModule:
             company_name (str): Name of the company
             variable (str): Variable to extract
             
-        Returns:
+        Returns
+        -------
             tuple | None: (url, value, currency, year, status) if successful, None if failed
         """
         attempt = 0
         while attempt < self.max_retries:
             try:
                 logger.info("Attempting to fetch website for '%s'", company_name)
-                raw_response = self.find_company_website_with_ai(company_name, variable)
+                # The cached answer is only worth a first attempt, the retries ask the AI again
+                raw_response = self.find_company_website_with_ai(company_name, variable, refresh=attempt > 0)
 
                 # TODO: Se non riceviamo una risposta, possiamo migliorare il prompt
                 # if not raw_response:
@@ -167,27 +303,100 @@ class WebScraperModule:
                 #     self.prompt_generator.improve_prompt(None, company_name, variable)
                 #     attempt += 1
                 #     continue
-
-                cleaned_response = re.sub(r"^```(?:json)?|```$", "", raw_response.strip(), flags=re.IGNORECASE)
-                data = json.loads(cleaned_response)
-                url = data.get("url")
-
-                if not url or self.is_page_not_found(url):
-                    logger.warning("Invalid or missing page for '%s' on attempt %d", company_name, attempt + 1)
-                    # TODO: Try to improve the prompt with the failed URL
-                    # self.prompt_generator.improve_prompt(url, company_name, variable)
+                if not raw_response:
+                    logger.warning("No response from the AI for '%s' on attempt %d", company_name, attempt + 1)
                     attempt += 1
                     continue
 
-                data["response_status"] = "Page found"
-                return tuple(data.values())
-
+                result = self._parse_ai_response(raw_response)
             except (json.JSONDecodeError, Exception) as e:
                 logger.warning("Error parsing or processing response on attempt %d: %s", attempt + 1, e)
                 attempt += 1
+            else:
+                if result is not None:
+                    return result
+                logger.warning("Invalid or missing page for '%s' on attempt %d", company_name, attempt + 1)
+                # TODO: Try to improve the prompt with the failed URL
+                # self.prompt_generator.improve_prompt(url, company_name, variable)
+                attempt += 1
 
         return None , None, None, None, "Page not found"
 
+    def scrape_financial_sources_batch(self, pairs: list[tuple[str, str]]) -> list[tuple]:
+        """Scrape several companies, asking the AI for all of them with batched requests.
+
+        Args:
+            pairs (list): Tuples of (company_name, variable) to scrape
+
+        Returns
+        -------
+            list: (url, value, currency, year, status) for each pair, in the same order
+        """
+        results: list[tuple | None] = [self._cached_result(company_name, variable) for company_name, variable in pairs]
+        pending = [index for index, result in enumerate(results) if result is None]
+
+        prompts = [self.prompt_generator.generate_prompt(pairs[index][0], variable=pairs[index][1]) for index in pending]
+        answers = self.prompt_generator.call_batch(prompts)
+
+        parsed = [self._load_batched_answer(pairs[index][0], answer) for index, answer in zip(pending, answers, strict=True)]
+        # All the candidate URLs of the batch are checked at once
+        urls = list(dict.fromkeys(data["url"] for data in parsed if data))
+        not_found = dict(zip(urls, self.pages_not_found(urls), strict=True))
+
+        unresolved = []
+        for index, data in zip(pending, parsed, strict=True):
+            company_name, variable = pairs[index]
+            if data and not not_found[data["url"]]:
+                data["response_status"] = "Page found"
+                results[index] = tuple(data.values())
+                self._store_result(company_name, variable, results[index])
+            else:
+                unresolved.append(index)
+
+        # Missing or unusable answers go through the complete single company flow, in parallel
+        for index, result in zip(unresolved, self.scrape_many([pairs[index] for index in unresolved]), strict=True):
+            results[index] = result
+        # Every pair is resolved by now, from the cache, the batched answers or the single company flow
+        return [result for result in results if result is not None]
+
+    @staticmethod
+    def _clean_llm_payload(text: str, fence_re: re.Pattern[str] = _JSON_FENCE_RE) -> str:
+        """Strip the surrounding whitespace, a leading BOM and the markdown fences of an AI answer."""
+        return fence_re.sub("", text.lstrip("\ufeff \t\r\n").rstrip())
+
+    def _load_batched_answer(self, company_name: str, answer: str | None) -> dict | None:
+        """Load the JSON answer of a batched request, return None if it has no single URL or it is not valid."""
+        if not answer:
+            return None
+        try:
+            data = orjson.loads(self._clean_llm_payload(answer))
+        except orjson.JSONDecodeError as e:
+            logger.warning("Error parsing the batched response for '%s': %s", company_name, e)
+            return None
+        if not isinstance(data, dict) or not data.get("url"):
+            return None
+        # The URLs of the batch are checked together, an object or a list there would fail the whole batch
+        if not isinstance(data["url"], str):
+            logger.warning("Malformed URL in the batched response for '%s': %r", company_name, data["url"])
+            return None
+        return data
+
+    def _parse_ai_response(self, raw_response: str) -> tuple | None:
+        """Parse the JSON answer of the AI, return None if it does not point to an existing page.
+
+        Raises
+        ------
+            orjson.JSONDecodeError: If the answer is not valid JSON
+        """
+        data = orjson.loads(self._clean_llm_payload(raw_response))
+        url = data.get("url")
+
+        if not url or self.is_page_not_found(url):
+            return None
+
+        data["response_status"] = "Page found"
+        return tuple(data.values())
+
     def ai_web_scraping_with_retries(self, company_name: str, variable: str) -> tuple | None:
         """Attempt AI web scraping with retries.
 
@@ -195,14 +404,15 @@ class WebScraperModule:
             company_name (str): Name of the company
             variable (str): Variable to extract
 
-        Returns:
+        Returns
+        -------
             tuple | None: (url, value, currency, year, status) if successful, None if failed
         """
         logger.info("Falling back to AI web scraping for '%s'", company_name)
         attempt_web_scraping = 0
         while attempt_web_scraping < self.max_retries:
             logger.info("Attempting AI web scraping for '%s' (attempt %d)", company_name, attempt_web_scraping + 1)
-            data = self.ai_web_scraping(company_name, variable)
+            data = self.ai_web_scraping(company_name, variable, refresh=attempt_web_scraping > 0)
             if data is None:
                 logger.warning("AI web scraping failed for '%s' on attempt %d", company_name, attempt_web_scraping + 1)
                 attempt_web_scraping += 1
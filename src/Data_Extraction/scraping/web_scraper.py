@@ -1,16 +1,24 @@
 """Challenge Code for scraping financial data sources."""
 
+import functools
 import logging
+import random
 import re
 import secrets
 import sys
+import threading
 import time
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
 from urllib.parse import urljoin, urlparse
 
+import lxml.html
 import requests
 from bs4 import BeautifulSoup
-from retry import retry
-from utils import laod_config_yaml
+from lxml import etree
+from model.response_cache import ResponseCache
+from requests.adapters import HTTPAdapter
+from utils import load_config_yaml
 
 # Logging configuration
 logging.basicConfig(
@@ -21,12 +29,118 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+# Patterns compiled once, they run for every link of the scraped pages
+_YEAR_RE = re.compile(r"20\d{2}")
+_LEGAL_FORM_RE = re.compile(r"\b(inc|corp|corporation|ltd|limited|llc|group|holding|holdings)\b", re.IGNORECASE)
+_TOKEN_RE = re.compile(r"\b\w+\b")
+_DOCUMENTS_RE = re.compile(r"Documents")
+
+
+def _keywords_re(*keywords: str) -> re.Pattern:
+    """Compile the keywords into a single alternation, one C-level scan per link instead of a loop."""
+    return re.compile("|".join(map(re.escape, keywords)), re.IGNORECASE)
+
+
+_IR_KEYWORDS = (
+    "investor",
+    "investors",
+    "investor relations",
+    "ir/",
+    "financials",
+    "shareholders",
+    "financial information",
+    "annual report",
+    "quarterly report",
+)
+_IR_KEYWORDS_RE = _keywords_re(*_IR_KEYWORDS)
+
+
+def _lowered(expression: str) -> str:
+    """XPath 1.0 has no lower-case(), translate the ASCII capitals instead."""
+    return f"translate({expression}, 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz')"
+
+
+# The links whose text or href contain an IR keyword, selected by libxml2 without building a Python object per link
+_IR_LINKS_XPATH = etree.XPath(
+    "//a[@href != ''][{}]".format(
+        " or ".join(f"contains({_lowered(node)}, '{keyword}')" for keyword in _IR_KEYWORDS for node in ("string(.)", "@href"))
+    )
+)
+_HTML_PARSER = lxml.html.HTMLParser(encoding="utf-8")
+_ANNUAL_REPORT_RE = _keywords_re(
+    "annual report",
+    "annual filing",
+    "10-k",
+    "yearly report",
+    "form 10-k",
+    "annual financial report",
+    "year-end report",
+)
+_QUARTERLY_REPORT_RE = _keywords_re("quarterly report", "quarterly filing", "10-q", "form 10-q", "q1", "q2", "q3", "q4")
+_CONSOLIDATED_REPORT_RE = _keywords_re(
+    "consolidated financial",
+    "consolidated statement",
+    "consolidated report",
+    "consolidated annual report",
+    "consolidated results",
+)
+_FINANCIAL_REPORT_RE = _keywords_re("financial report", "financial statement", "financial results", "earnings report")
+_DOCUMENT_EXTENSION_RE = re.compile(r"\.(?:pdf|docx?|xlsx?|html)$", re.IGNORECASE)
+_NON_CORPORATE_RE = _keywords_re(
+    "google.",
+    "facebook.",
+    "youtube.",
+    "linkedin.",
+    "twitter.",
+    "amazon.",
+    "bing.",
+    "yahoo.",
+    "instagram.",
+    "wikipedia.",
+)
+# Answers worth another attempt, as in the retry policy of the AI scraper session
+_RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+# Tokens too common to identify a company domain
+_STOP_TOKENS = frozenset({"inc", "ltd", "the", "and", "corp"})
+# Plain substrings, case sensitive, as the former list of indicators ("Inc" also covers "Inc.")
+_US_INDICATOR_RE = re.compile(r"Inc|Corp|LLC|LLP|Co\.|USA|America|US ")
+
+# The sitemaps come from untrusted servers: no entity expansion nor network access while parsing
+_SITEMAP_PARSER = etree.XMLParser(resolve_entities=False, no_network=True)
+
+
+@functools.lru_cache(maxsize=4096)
+def _tokenize(name: str) -> tuple[str, ...]:
+    """Split the company name into significant tokens, cached since every result link checks the same name."""
+    # Rimuovi elementi comuni come Inc, Corp, Ltd
+    cleaned = _LEGAL_FORM_RE.sub("", name)
+
+    # Dividi in token
+    return tuple(t for t in _TOKEN_RE.findall(cleaned) if len(t) > 1)
+
+
+@functools.lru_cache(maxsize=4096)
+def _domain_tokens(name: str) -> tuple[str, ...]:
+    """Tokens of the company name long enough to be looked for in a domain, in name order."""
+    return tuple(t for t in _tokenize(name) if len(t) > 2)
+
+
+def _header_seconds(value: str | None) -> float | None:
+    """Read a delay header, given either in seconds or as an epoch timestamp (X-RateLimit-Reset)."""
+    try:
+        seconds = float(value)
+    except (TypeError, ValueError):  # Missing, or an HTTP date
+        return None
+    # Values beyond a year are epoch timestamps
+    return max(0.0, seconds - time.time()) if seconds > 365 * 24 * 3600 else seconds
+
+
 class WebScraperModule:
     """Module for web scraping financial data sources."""
 
     def __init__(
         self,
-        config_path: str = "src/Data_Discovery/config/scraping_config/config.yaml",
+        config_path: str = "src/Data_Extraction/config/scraping_config/config.yaml",
         user_agent: str | None = None,
     ):
         """
@@ -38,9 +152,19 @@ class WebScraperModule:
             max_retries (int): Numero massimo di tentativi per le richieste
         """
         self.session = requests.Session()
-        self.config = laod_config_yaml(config_path)
+        self.config = load_config_yaml(config_path)
         self.timeout = self.config["timeout"]
         self.max_retries = self.config["max_retries"]
+        self.retry_delay = self.config["retry_delay"]
+        self.max_workers = self.config["max_workers"]
+        # The session is shared by the worker threads of `scrape_many`, keep enough connections for all of them
+        adapter = HTTPAdapter(pool_connections=self.config["pool_maxsize"], pool_maxsize=self.config["pool_maxsize"])
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        # Cap of the requests in flight across all the threads
+        self._request_slots = threading.BoundedSemaphore(self.config["max_concurrent_requests"])
+        # Independent lookups of a company (candidate domains, SEC search) run here at the same time
+        self._probe_executor = ThreadPoolExecutor(max_workers=self.config["probe_workers"])
         # self.prompt = self.config["prompt"]
 
         if user_agent is None:
@@ -59,32 +183,112 @@ class WebScraperModule:
             }
         )
 
-        # Add the delay to avoid being blocked by the server
-        self.request_delay = self.config["request_delay"]
+        # Pages downloaded by the previous runs, only the successful downloads are kept
+        self.use_page_cache = self.config["use_page_cache"]
+        self.page_cache = ResponseCache(self.config["page_cache_dir"], max_age=self.config["page_cache_max_age_days"] * 24 * 3600, in_memory=False)
+        # Guessed company domains that failed recently, they are not probed again until the entry expires
+        self.unreachable_domains = ResponseCache(
+            self.config["unreachable_domains_dir"], max_age=self.config["unreachable_domains_max_age_days"] * 24 * 3600
+        )
 
-    @retry(tries=1, delay=3, backoff=2, jitter=1)
-    def get_page(self, url: str) -> str | None:
+        # Add the delay to avoid being blocked by the server, between two requests to the same host
+        self.request_delay = self.config["request_delay"]
+        self.max_requests_per_host = self.config["max_requests_per_host"]
+        self._host_lock = threading.Lock()
+        self._host_slots: dict[str, threading.BoundedSemaphore] = {}
+        # Monotonic time of the next request allowed per host, and consecutive 429 answers per host
+        self._next_allowed: dict[str, float] = defaultdict(float)
+        self._host_throttles: dict[str, int] = defaultdict(int)
+
+    def get_page(self, url: str, *, force_refresh: bool = False) -> str | None:
         """Load the HTML page from the given URL.
 
+        The pages downloaded in the last `page_cache_max_age_days` days are read from the page cache.
+        Timeouts and the 429/5xx answers are retried up to `max_retries` times with exponential backoff,
+        a Retry-After header of the server takes precedence.
+
         Args:
             url (str): url of the page to load.
+            force_refresh (bool): Download the page even if it is in the cache.
 
         Returns
         -------
             str: HTML content of the page or None if failed to load
         """
-        try:
-            # Sleep to avoid being blocked by the server
-            time.sleep(self.request_delay)
-
-            response = self.session.get(url, timeout=self.timeout)
+        cache_key = ResponseCache.make_key(url=url) if self.use_page_cache else None
+        if cache_key and not force_refresh:
+            cached_page = self.page_cache.get(cache_key)
+            if cached_page is not None:
+                return cached_page
+
+        host = urlparse(url).netloc
+        for attempt in range(self.max_retries):
+            # Sleep to avoid being blocked by the server, only the requests to the same host wait
+            time.sleep(self._reserve_host_slot(host))
+            is_last_attempt = attempt == self.max_retries - 1
+            try:
+                with self._request_slots, self._host_slot(host):
+                    response = self.session.get(url, timeout=self.timeout)
+            except requests.Timeout as e:
+                logger.warning("Errore durante il download della pagina %s: %s", url, e)
+                if is_last_attempt:
+                    raise
+                time.sleep(self._backoff_delay(attempt))
+                continue
+            except Exception as e:
+                # Unreachable hosts (guessed domains) fail the same way on every attempt
+                logger.warning("Errore durante il download della pagina %s: %s", url, e)
+                raise
+
+            # A 429 also delays the next request to the host by its Retry-After, see _update_host_throttle
+            self._update_host_throttle(host, response)
             if response.status_code == 200:
+                if cache_key:
+                    self.page_cache.set(cache_key, response.text)
                 return response.text
             logger.warning("Status code for the %s: %s", url, response.status_code)
-            return None  # noqa: TRY300
-        except Exception as e:
-            logger.warning("Errore durante il download della pagina %s: %s", url, e)
-            raise  # The retry decorator will handle the retry logic
+            if response.status_code not in _RETRYABLE_STATUS_CODES or is_last_attempt:
+                return None
+            if response.status_code != 429:
+                time.sleep(self._backoff_delay(attempt))
+        return None
+
+    def _backoff_delay(self, attempt: int) -> float:
+        """Exponential backoff from `retry_delay`, with up to 20% of jitter to spread the concurrent retries."""
+        return self.retry_delay * 2**attempt * (1 + random.random() * 0.2)  # noqa: S311
+
+    def _host_slot(self, host: str) -> threading.BoundedSemaphore:
+        """Return the semaphore bounding the concurrent requests to the host."""
+        with self._host_lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.max_requests_per_host)
+            return self._host_slots[host]
+
+    def _reserve_host_slot(self, host: str) -> float:
+        """Book the next request to the host, `request_delay` after the previous one, and return the wait."""
+        with self._host_lock:
+            now = time.monotonic()
+            start = max(now, self._next_allowed[host])
+            self._next_allowed[host] = start + self.request_delay
+        return start - now
+
+    def _update_host_throttle(self, host: str, response: requests.Response) -> None:
+        """Delay the next requests to the host when it rate limits us, following the response headers."""
+        delay = 0.0
+        if response.status_code == 429:
+            with self._host_lock:
+                self._host_throttles[host] += 1
+                attempt = self._host_throttles[host]
+            # Retry-After when given, otherwise exponential backoff on the consecutive 429 of the host
+            delay = _header_seconds(response.headers.get("Retry-After")) or self.request_delay * 2**attempt
+        else:
+            self._host_throttles.pop(host, None)
+            if response.headers.get("X-RateLimit-Remaining") == "0":
+                delay = _header_seconds(response.headers.get("X-RateLimit-Reset")) or 0.0
+        if delay > 0:
+            logger.info("Host %s is rate limiting, next request in %.1f seconds", host, delay)
+            with self._host_lock:
+                self._next_allowed[host] = max(self._next_allowed[host], time.monotonic() + delay)
 
     def find_company_website(self, company_name: str) -> str | None:
         """
@@ -101,32 +305,49 @@ class WebScraperModule:
             # Alternative approch and direct approch
 
             # Start trying to build a direct URL from the company name
-            company_tokens = self._tokenize_company_name(company_name.lower())
+            # Tokens of the name worth looking for in a domain, computed once for all the result links below
+            company_tokens = _domain_tokens(company_name.lower())
 
             # Remove common tokens that are not significant for the domain
-            significant_tokens = [t for t in company_tokens if len(t) > 2 and t not in ["inc", "ltd", "the", "and", "corp"]]
+            significant_tokens = [t for t in company_tokens if t not in _STOP_TOKENS]
             if significant_tokens:
                 # Try to build a domain from the first two significant tokens
                 company_domain = significant_tokens[0].lower()
                 if len(significant_tokens) > 1:
                     company_domain += significant_tokens[1].lower()
 
-                # Try to build potential domains
+                # Try to build potential domains, the duplicates removed
+                potential_domains = list(
+                    dict.fromkeys(
+                        [
+                            f"https://www.{company_domain}.com/",
+                            f"https://{company_domain}.com/",
+                            f"https://www.{company_domain}.org/",
+                            f"https://www.{significant_tokens[0]}.com/",
+                        ]
+                    )
+                )
+
+                # Skip the domains that failed in a recent run
                 potential_domains = [
-                    f"https://www.{company_domain}.com/",
-                    f"https://{company_domain}.com/",
-                    f"https://www.{company_domain}.org/",
-                    f"https://www.{significant_tokens[0]}.com/",
+                    domain for domain in potential_domains if self.unreachable_domains.get(ResponseCache.make_key(domain=domain)) is None
                 ]
 
-                for domain in potential_domains:
-                    try:
-                        logger.info("Attempting direct access to %s", domain)
-                        html = self.get_page(domain)
+                # Probe all the candidates at once, the first reachable one in order of preference wins
+                logger.info("Attempting direct access to %s", ", ".join(potential_domains))
+                probes = [self._probe_executor.submit(self.get_page, domain) for domain in potential_domains]
+                try:
+                    for domain, probe in zip(potential_domains, probes, strict=True):
+                        try:
+                            html = probe.result()
+                        except (requests.RequestException, ValueError):
+                            html = None
                         if html:
                             return domain
-                    except (requests.RequestException, ValueError):  # noqa: PERF203
-                        continue
+                        self.unreachable_domains.set(ResponseCache.make_key(domain=domain), "unreachable")
+                finally:
+                    for probe in probes:
+                        probe.cancel()
 
             #  DuckDuckGo search for the official website
             search_url = f"https://duckduckgo.com/html/?q={company_name}+official+website"
@@ -139,13 +360,13 @@ class WebScraperModule:
                     return None  # Questo farà sì che il codice passi direttamente alla ricerca SEC
                 return None
 
-            soup = BeautifulSoup(html, "html.parser")
+            soup = BeautifulSoup(html, "lxml")
             results = soup.find_all("a", {"class": "result__url"})
 
             # Filter the results to obtain plausible corporate domains
             for result in results:
                 url = result.get("href")
-                if url and self._is_corporate_domain(url, company_name):
+                if url and self._is_corporate_domain(url, company_tokens):
                     # verify if the URL is valid and accessible and the official website
                     return self._normalize_url(url)
 
@@ -153,7 +374,7 @@ class WebScraperModule:
             all_links = soup.find_all("a")
             for link in all_links:
                 url = link.get("href")
-                if url and self._is_potential_corporate_domain(url, company_name):
+                if url and self._is_potential_corporate_domain(url, significant_tokens):
                     return self._normalize_url(url)
 
             return None  # noqa: TRY300
@@ -161,61 +382,32 @@ class WebScraperModule:
             logger.exception("Error while searching for the website of %s", company_name)
             return None
 
-    def _is_corporate_domain(self, url: str, company_name: str) -> bool:
-        """Check if a URL is likely the corporate domain."""
-        domain = urlparse(url).netloc
-
-        # remove the protocol and www
-        domain = domain.lower().replace("www.", "")
-        company_tokens = set(self._tokenize_company_name(company_name.lower()))
+    def _is_corporate_domain(self, url: str, company_tokens: tuple[str, ...]) -> bool:
+        """Check if a URL is likely the corporate domain, `company_tokens` are the tokens of the name longer than 2 characters."""
+        # Host without the www prefix, lowered once
+        domain = urlparse(url).netloc.lower().removeprefix("www.")
 
         # Check if the domain contains significant tokens from the company name
-        return any(token in domain for token in company_tokens if len(token) > 2)
+        return any(token in domain for token in company_tokens)
 
-    def _is_potential_corporate_domain(self, url: str, company_name: str) -> bool:
-        """Verifica meno stringente per identificare possibili domini aziendali."""
+    def _is_potential_corporate_domain(self, url: str, significant_tokens: list[str]) -> bool:
+        """Verifica meno stringente per identificare possibili domini aziendali, dati i token significativi del nome."""
         # Rimuovi parametri e frammenti
         url = url.split("?")[0].split("#")[0]
 
         # Ignora URL di motori di ricerca e siti noti non aziendali
-        non_corporate_domains = [
-            "google.",
-            "facebook.",
-            "youtube.",
-            "linkedin.",
-            "twitter.",
-            "amazon.",
-            "bing.",
-            "yahoo.",
-            "instagram.",
-            "wikipedia.",
-        ]
-
-        if any(nd in url.lower() for nd in non_corporate_domains):
+        if _NON_CORPORATE_RE.search(url):
             return False
 
         # Estrai il dominio
-        domain = urlparse(url).netloc
+        domain = urlparse(url).netloc.lower()
         if not domain:
             return False
 
         # Verifica se parti del nome dell'azienda sono nel dominio
-        domain = domain.lower()
-        company_tokens = self._tokenize_company_name(company_name.lower())
-
         # Controlla sovrapposizione tra i token significativi e il dominio
-        significant_tokens = [t for t in company_tokens if len(t) > 2 and t not in ["inc", "ltd", "the", "and", "corp"]]
         return any(token in domain for token in significant_tokens)
 
-    def _tokenize_company_name(self, name: str) -> list:
-        """Split the company name into significant tokens."""
-        # Rimuovi elementi comuni come Inc, Corp, Ltd
-        cleaned = re.sub(r"\b(inc|corp|corporation|ltd|limited|llc|group|holding|holdings)\b", "", name, flags=re.IGNORECASE)
-
-        # Dividi in token
-        tokens = re.findall(r"\b\w+\b", cleaned)
-        return [t for t in tokens if len(t) > 1]
-
     def _normalize_url(self, url: str) -> str:
         """Normalize a URL ensuring it is complete and valid."""
         if not (url.startswith(("http://", "https://"))):
@@ -246,44 +438,26 @@ class WebScraperModule:
             if not html:
                 return None
 
-            soup = BeautifulSoup(html, "html.parser")
-
-            # Cerca link che contengono termini relativi a IR
-            ir_keywords = [
-                "investor",
-                "investors",
-                "investor relations",
-                "ir/",
-                "financials",
-                "shareholders",
-                "financial information",
-                "annual report",
-                "quarterly report",
-            ]
-
-            # Cerca nei menu principali e nei footer
-            for link in soup.find_all("a"):
-                text = link.get_text().lower().strip()
-                href = link.get("href")
+            # The page is decoded already, the explicit encoding overrides its XML or meta declaration
+            document = lxml.html.document_fromstring(html.encode("utf-8"), parser=_HTML_PARSER)
 
-                if not href:
-                    continue
-
-                # Controlla se il testo del link o l'URL contiene parole chiave IR
-                if any(keyword in text or keyword in href.lower() for keyword in ir_keywords):
-                    return urljoin(company_url, href)
+            # Cerca nei menu principali e nei footer, il primo link con parole chiave IR nel testo o nell'URL
+            ir_links = _IR_LINKS_XPATH(document)
+            if ir_links:
+                return urljoin(company_url, ir_links[0].get("href"))
 
             # Metodo alternativo: cerca nella sitemap se disponibile
             sitemap_url = urljoin(company_url, "sitemap.xml")
             try:
                 sitemap_content = self.get_page(sitemap_url)
                 if sitemap_content:
-                    sitemap_soup = BeautifulSoup(sitemap_content, "xml")
-                    for loc in sitemap_soup.find_all("loc"):
-                        url = loc.text
-                        if any(keyword in url.lower() for keyword in ir_keywords):
+                    sitemap = etree.fromstring(sitemap_content.encode("utf-8"), parser=_SITEMAP_PARSER)
+                    # Any namespace, the sitemaps.org one or none
+                    for loc in sitemap.iter("{*}loc"):
+                        url = (loc.text or "").strip()
+                        if _IR_KEYWORDS_RE.search(url):
                             return url
-            except (requests.RequestException, ValueError):
+            except (requests.RequestException, ValueError, etree.XMLSyntaxError):
                 logger.warning("Sitemap non disponibile o errore durante il download: %s", sitemap_url)
 
             return None  # noqa: TRY300
@@ -307,31 +481,18 @@ class WebScraperModule:
             if not html:
                 return []
 
-            soup = BeautifulSoup(html, "html.parser")
+            soup = BeautifulSoup(html, "lxml")
 
             # Determina le parole chiave in base al tipo di report
-            if source_type.lower() == "annual report" or source_type.lower() == "annual":
-                keywords = [
-                    "annual report",
-                    "annual filing",
-                    "10-k",
-                    "yearly report",
-                    "form 10-k",
-                    "annual financial report",
-                    "year-end report",
-                ]
-            elif source_type.lower() == "quarterly report" or source_type.lower() == "quarterly":
-                keywords = ["quarterly report", "quarterly filing", "10-q", "form 10-q", "q1", "q2", "q3", "q4"]
-            elif source_type.lower() == "consolidated":
-                keywords = [
-                    "consolidated financial",
-                    "consolidated statement",
-                    "consolidated report",
-                    "consolidated annual report",
-                    "consolidated results",
-                ]
+            report_type = source_type.lower()
+            if report_type in ("annual report", "annual"):
+                keywords_re = _ANNUAL_REPORT_RE
+            elif report_type in ("quarterly report", "quarterly"):
+                keywords_re = _QUARTERLY_REPORT_RE
+            elif report_type == "consolidated":
+                keywords_re = _CONSOLIDATED_REPORT_RE
             else:
-                keywords = ["financial report", "financial statement", "financial results", "earnings report"]
+                keywords_re = _FINANCIAL_REPORT_RE
 
             # Cerca report sia nei link testuali che nei PDF/documenti
             results = []
@@ -342,8 +503,8 @@ class WebScraperModule:
                 href = link.get("href", "")
 
                 # Verifica se è un link a un documento finanziario
-                is_financial_doc = any(keyword in text.lower() or keyword in href.lower() for keyword in keywords)
-                is_document = href.lower().endswith((".pdf", ".doc", ".docx", ".xls", ".xlsx", ".html"))
+                is_financial_doc = bool(keywords_re.search(text) or keywords_re.search(href))
+                is_document = bool(_DOCUMENT_EXTENSION_RE.search(href))
 
                 if is_financial_doc and (is_document or "download" in href.lower()):
                     # Estrai l'anno dal testo del link o dal nome del file
@@ -363,39 +524,15 @@ class WebScraperModule:
 
     def _extract_year_from_text(self, text: str) -> str | None:
         """Extract the year from the text."""
-        # Regex pattern to match various year formats
-        year_patterns = [
-            r"20\d{2}",  # Anno standard a 4 cifre
-            r"FY\s*20\d{2}",  # Anno fiscale
-            r"20\d{2}[/-]20\d{2}",  # Intervallo di anni
-        ]
-
-        for pattern in year_patterns:
-            match = re.search(pattern, text)
-            if match:
-                year_text = match.group(0)
-                # Extract only the year part (e.g., 2023 from FY2023 or 2023-2024)
-                return re.search(r"20\d{2}", year_text).group(0)
-
-        return None
+        # The first 20xx of the text, also inside fiscal years (FY2023) and ranges (2023-2024)
+        match = _YEAR_RE.search(text)
+        return match.group(0) if match else None
 
     def _extract_year_from_url(self, url: str) -> str | None:
         """Extract the year from the URL."""
-        # Simile all'estrazione dal testo, ma specifico per URL
-        year_patterns = [
-            r"20\d{2}",  # Anno standard
-            r"FY-?20\d{2}",  # FY2023 o FY-2023
-            r"AR-?20\d{2}",  # AR2023 o AR-2023 (Annual Report)
-        ]
-
-        for pattern in year_patterns:
-            match = re.search(pattern, url)
-            if match:
-                year_text = match.group(0)
-                # Extract only the year part (e.g., 2023 from FY2023 or 2023-2024)
-                return re.search(r"20\d{2}", year_text).group(0)
-
-        return None
+        # Same as the text, e.g. 2023 from FY-2023 or AR2023 (Annual Report)
+        match = _YEAR_RE.search(url)
+        return match.group(0) if match else None
 
     def find_sec_filings(self, company_name: str, form_type="10-K") -> list:
         """Look for SEC filings for the company.
@@ -417,7 +554,7 @@ class WebScraperModule:
             if not html:
                 return []
 
-            soup = BeautifulSoup(html, "html.parser")
+            soup = BeautifulSoup(html, "lxml")
             results = []
 
             # Cerca le tabelle dei risultati
@@ -429,14 +566,14 @@ class WebScraperModule:
                     continue
 
                 date_text = date_elem.get_text().strip()
-                year_match = re.search(r"20\d{2}", date_text)
+                year_match = _YEAR_RE.search(date_text)
                 if not year_match:
                     continue
 
                 year = year_match.group(0)
 
                 # Cerca il link ai documenti
-                doc_link = item.find("a", text=re.compile(r"Documents"))
+                doc_link = item.find("a", text=_DOCUMENTS_RE)
                 if not doc_link:
                     continue
 
@@ -466,6 +603,16 @@ class WebScraperModule:
         """
         logger.info("Start %s (Type: %s)", company_name, source_type)
 
+        # The SEC search is the fallback of every step below, start it now so it runs alongside them
+        sec_search = self._probe_executor.submit(self.find_sec_filings, company_name) if self._could_be_us_company(company_name) else None
+        try:
+            return self._scrape_company(company_name, source_type, sec_search)
+        finally:
+            if sec_search is not None:
+                sec_search.cancel()
+
+    def _scrape_company(self, company_name: str, source_type: str, sec_search: Future | None) -> tuple:
+        """Run the steps of `scrape_financial_sources`, `sec_search` is the pending 10-K search for US companies."""
         # Find the web site of the company
         company_url = self.find_company_website(company_name)
 
@@ -474,9 +621,9 @@ class WebScraperModule:
             logger.warning("Impossible to find %s", company_name)
 
             # Prova con ricerca SEC se potrebbe essere un'azienda USA
-            if self._could_be_us_company(company_name):
+            if sec_search is not None:
                 logger.info(" Tentative for %s", company_name)
-                sec_results = self.find_sec_filings(company_name)
+                sec_results = sec_search.result()
                 if sec_results:
                     best_url, best_year = sec_results[0]
                     return best_url, best_year, "SEC Filing", "MEDIA"
@@ -491,8 +638,8 @@ class WebScraperModule:
         if not ir_page:
             logger.warning("Impossible to find the IR for the %s", company_name)
 
-            if self._could_be_us_company(company_name):
-                sec_results = self.find_sec_filings(company_name)
+            if sec_search is not None:
+                sec_results = sec_search.result()
                 if sec_results:
                     best_url, best_year = sec_results[0]
                     return best_url, best_year, "SEC Filing", "MEDIA"
@@ -505,9 +652,9 @@ class WebScraperModule:
         reports = self.find_financial_reports(ir_page, source_type)
 
         # If no reports found, try SEC filings as a fallback
-        if not reports and self._could_be_us_company(company_name):
-            form_type = "10-K" if source_type.lower() in ["annual", "annual report"] else "10-Q"
-            sec_results = self.find_sec_filings(company_name, form_type)
+        if not reports and sec_search is not None:
+            is_annual = source_type.lower() in ["annual", "annual report"]
+            sec_results = sec_search.result() if is_annual else self.find_sec_filings(company_name, "10-Q")
             reports.extend(sec_results)
 
         if not reports:
@@ -532,7 +679,25 @@ class WebScraperModule:
 
         return best_url, best_year, source_description, confidence
 
+    def scrape_many(self, companies: list[tuple[str, str]]) -> list[tuple | None]:
+        """
+        Scrape several companies concurrently, see `scrape_financial_sources`.
+
+        The work is network bound: the companies run in `max_workers` threads, so the page downloads
+        and the request delays of different companies overlap instead of adding up.
+
+        Args:
+            companies (list): Tuples of (company_name, source_type)
+
+        Returns
+        -------
+            list: (url, year, source_description, confidence) for each company, in the same order
+        """
+        if len(companies) <= 1:
+            return [self.scrape_financial_sources(company_name, source_type) for company_name, source_type in companies]
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(companies))) as executor:
+            return list(executor.map(self.scrape_financial_sources, *zip(*companies, strict=True)))
+
     def _could_be_us_company(self, company_name: str) -> bool:
         """Check if the company name suggests it could be a US company."""
-        us_indicators = ["Inc", "Inc.", "Corp", "Corp.", "LLC", "LLP", "Co.", "USA", "America", "US "]
-        return any(indicator in company_name for indicator in us_indicators)
+        return _US_INDICATOR_RE.search(company_name) is not None
@@ -2,37 +2,85 @@
 
 import logging
 import os
-from pathlib import Path
 import re
 import json
+from concurrent.futures import ThreadPoolExecutor
 
+import numpy as np
 import pandas as pd
-from utils import load_config_yaml, load_json_obj
+from utils import load_config_yaml, load_json_obj, load_jsonl_obj
 
-CONFIDENCE_ORDER = {"LOW": 0, "MEDIUM": 1, "HIGH": 2}
+# Fields of the reports written by the finder, the only ones read from the report files
+REPORT_COLUMNS = ['ID', 'NAME', 'VARIABLE', 'VALUE', 'CURRENCY', 'REFYEAR', 'SRC', 'Page Status']
+
+# Compiled once, the validation helpers run on every row
+_NON_WORD_RE = re.compile(r'\W+')
+_URL_RE = re.compile(r'^https?://[^\s/$.?#].[^\s]*$')
+_NON_NUMERIC_RE = re.compile(r'[^\d.-]')
+
+# Confidence levels from the lowest to the highest, stored as small integer codes
+CONFIDENCE_LEVELS = pd.CategoricalDtype(["LOW", "MEDIUM", "HIGH"], ordered=True)
 
 
 def normalize_name(name):
     """Normalize company names to enable matching."""
-    return re.sub(r'\W+', '', str(name)).upper()
+    return _NON_WORD_RE.sub('', str(name)).upper()
+
+
+def report_keys(df):
+    """Build the (ID, normalized NAME, VARIABLE) keys matching the reports to the dataset rows."""
+    return pd.MultiIndex.from_arrays([
+        df['ID'],
+        df['NAME'].astype(str).str.replace(_NON_WORD_RE, '', regex=True).str.upper(),
+        df['VARIABLE'].astype(str).str.upper(),
+    ])
+
+
+def is_filled(column):
+    """Return the mask of the values of the column that are neither missing nor empty strings."""
+    return column.notna() & (column != '')
+
+
+def score_quality(df, has_source):
+    """
+    Score the completeness of each row and derive its confidence level, for all the rows at once.
+
+    Args:
+        df (pd.DataFrame): Rows with the VALUE, CURRENCY, REFYEAR and PAGE_STATUS columns.
+        has_source (pd.Series): Mask of the rows with a source URL.
+
+    Returns
+    -------
+        tuple: The DATA_COMPLETENESS and CONFIDENCE_LEVEL columns.
+    """
+    has_value = is_filled(df['VALUE'])
+    page_found = df['PAGE_STATUS'] == 'Page found'
+    completeness = (
+        0.4 * has_value
+        + 0.3 * has_source
+        + 0.15 * is_filled(df['CURRENCY'])
+        + 0.15 * is_filled(df['REFYEAR'])
+        + 0.1 * page_found
+    ).clip(upper=1.0)
+    # Codes of CONFIDENCE_LEVELS: 0 (LOW), 1 (MEDIUM) with a value, 2 (HIGH) when high overrides it
+    high = (has_value & has_source) | (page_found & (completeness >= 0.7))
+    codes = np.maximum(has_value.to_numpy(dtype=np.int8), 2 * high.to_numpy(dtype=np.int8))
+    return completeness, pd.Series(pd.Categorical.from_codes(codes, dtype=CONFIDENCE_LEVELS), index=df.index)
 
 
 def is_valid_url(url):
     """Check if a string is a valid URL format."""
-    if pd.isna(url) or url == '' or url == 'N/A':
-        return False
-    
-    # Check for common invalid formats
-    if url == 'NO_DATA_FOUND':
-        return False
-    
-    # Check if it's a dictionary-like string
-    if isinstance(url, str) and (url.startswith('{') or url.startswith('{')):
+    if not isinstance(url, str):
+        if pd.isna(url):
+            return False
+        url = str(url)
+
+    # The prefix check alone rejects the empty, placeholder (N/A, NO_DATA_FOUND) and dictionary-like values
+    if not url.startswith(('http://', 'https://')):
         return False
-    
+
     # Basic URL validation
-    url_pattern = r'^https?://[^\s/$.?#].[^\s]*$'
-    return bool(re.match(url_pattern, str(url)))
+    return _URL_RE.match(url) is not None
 
 
 def clean_src_column(src_value):
@@ -94,7 +142,7 @@ def clean_refyear_column(refyear_value):
     # Try to extract numeric value
     try:
         # Remove any non-digit characters except decimal point and minus sign
-        cleaned = re.sub(r'[^\d.-]', '', refyear_str)
+        cleaned = _NON_NUMERIC_RE.sub('', refyear_str)
         if cleaned:
             # Convert to float first, then to int if it's a whole number
             float_val = float(cleaned)
@@ -108,6 +156,35 @@ def clean_refyear_column(refyear_value):
     return None
 
 
+def _is_dict_like(text):
+    """Return the mask of the stripped strings holding a dictionary, e.g. a whole AI answer instead of a value."""
+    return text.str.startswith('{') & text.str.endswith('}')
+
+
+def clean_src_series(src):
+    """Clean and validate a whole SRC column, as `clean_src_column` does for each value."""
+    text = src.astype(str).str.strip()
+    cleaned = text.where(src.notna() & text.str.match(_URL_RE), '')
+    # The rare dictionary-like values go through the scalar parser
+    dict_like = src.notna() & _is_dict_like(text)
+    if dict_like.any():
+        cleaned = cleaned.astype(object)
+        cleaned[dict_like] = src[dict_like].map(clean_src_column)
+    return cleaned
+
+
+def clean_refyear_series(refyear):
+    """Clean and validate a whole REFYEAR column, as `clean_refyear_column` does for each value."""
+    text = refyear.astype(str).str.strip()
+    years = pd.to_numeric(text.str.replace(_NON_NUMERIC_RE, '', regex=True), errors='coerce')
+    years = np.trunc(years.where(refyear.notna() & years.between(1800, 2030)))
+    # The rare dictionary-like values go through the scalar parser
+    dict_like = refyear.notna() & _is_dict_like(text)
+    if dict_like.any():
+        years[dict_like] = refyear[dict_like].map(clean_refyear_column).astype(float)
+    return years
+
+
 class DataExtractionSubmission:
     """Handles data preparation and submission for the Data Discovery project."""
 
@@ -116,74 +193,114 @@ class DataExtractionSubmission:
         self.original_data_path = self.config.get("original_data_path")
         self.reports_path = self.config.get("reports_path")
         self.submission_path = self.config.get("submission_path")
-        self.dataset = pd.read_csv(self.original_data_path, sep=";")
+        self.load_workers = self.config.get("load_workers", 32)
+        self.load_chunk_files = self.config.get("load_chunk_files", 256)
+        # The multithreaded Arrow parser, the dataset keeps the usual NumPy backed dtypes. The names and
+        # variables repeat on many rows, as categories each row only holds an integer code
+        self.dataset = pd.read_csv(self.original_data_path, sep=";", engine="pyarrow", dtype={"NAME": "category", "VARIABLE": "category"})
+        # Keys of the dataset rows, built once for all the lookups of the reports
+        self._dataset_keys = report_keys(self.dataset)
+        # (reports_df, positions) of the last reports matched to the dataset rows
+        self._report_rows = None
         self.processed_data = None
+        # Positions of the processed rows per value of a column, built on the first lookup of the column
+        self._row_positions = {}
         self.logger = logging.getLogger(__name__)
 
     def load_reports_data(self):
         """Load all report JSON files and combine them into a single dataframe."""
-        all_reports = []
-
         if not os.path.exists(self.reports_path):
-            self.logger.error(f"Reports path does not exist: {self.reports_path}")
+            self.logger.error("Reports path does not exist: %s", self.reports_path)
             return pd.DataFrame()
 
-        json_files = list(Path(self.reports_path).glob("*.json"))
+        # scandir already knows the entry types, no stat per file
+        with os.scandir(self.reports_path) as entries:
+            json_files = [entry.path for entry in entries if entry.name.endswith((".json", ".jsonl")) and entry.is_file()]
 
         if not json_files:
-            self.logger.warning(f"No JSON files found in {self.reports_path}")
+            self.logger.warning("No JSON files found in %s", self.reports_path)
             return pd.DataFrame()
 
-        for json_file in json_files:
-            try:
-                reports = load_json_obj(str(json_file))
-                if isinstance(reports, list):
-                    all_reports.extend(reports)
-                else:
-                    all_reports.append(reports)
-            except Exception as e:
-                self.logger.error(f"Error loading {json_file}: {e}")
-                continue
-
-        if not all_reports:
+        chunks = list(self.iter_report_chunks(json_files))
+        if not chunks:
             self.logger.warning("No valid reports found")
             return pd.DataFrame()
 
-        return pd.DataFrame(all_reports)
+        return pd.concat(chunks, ignore_index=True)
+
+    def iter_report_chunks(self, json_files):
+        """
+        Yield the reports of the files as dataframes, `load_chunk_files` files at a time.
+
+        The parsed reports of a chunk are dropped once it is converted, so at most one chunk of them is
+        held as Python objects instead of all the reports.
+        """
+        with ThreadPoolExecutor(max_workers=self.load_workers) as executor:
+            for start in range(0, len(json_files), self.load_chunk_files):
+                chunk_reports = []
+                for reports in executor.map(self._load_report_file, json_files[start:start + self.load_chunk_files]):
+                    if isinstance(reports, list):
+                        chunk_reports.extend(reports)
+                    elif reports is not None:
+                        chunk_reports.append(reports)
+                if chunk_reports:
+                    # The same columns in every chunk, whatever the keys of its reports
+                    yield pd.DataFrame.from_records(chunk_reports, columns=REPORT_COLUMNS)
+
+    def _load_report_file(self, json_file):
+        """Load one report file, JSON or JSON Lines, None if it cannot be read."""
+        try:
+            if json_file.endswith(".jsonl"):
+                return load_jsonl_obj(json_file)
+            return load_json_obj(json_file)
+        except Exception as e:
+            self.logger.error("Error loading %s: %s", json_file, e)
+            return None
+
+    def _matched_report_rows(self, reports_df):
+        """
+        Return, for each dataset row, the position in `reports_df` of its report (the last one of the key), -1 if none.
+
+        The keys are matched once, as integer codes of the MultiIndex, and the positions are reused by the
+        merge and the quality metrics.
+        """
+        if self._report_rows is None or self._report_rows[0] is not reports_df:
+            keys = report_keys(reports_df)
+            last = np.flatnonzero(~keys.duplicated(keep='last'))
+            found = keys[last].get_indexer(self._dataset_keys)
+            self._report_rows = (reports_df, np.where(found >= 0, last[found], -1))
+        return self._report_rows[1]
+
+    def _report_column(self, reports_df, col, index):
+        """Return the report values of the column aligned to the dataset rows, NaN where a row has no report."""
+        rows = self._matched_report_rows(reports_df)
+        values = pd.Series(reports_df[col].to_numpy()[rows], index=index)
+        return values.where(rows >= 0)
 
     def merge_with_original_data(self, reports_df):
         """Populate original dataset columns with data from reports."""
-        result_df = self.dataset.copy()
+        # Only whole columns are assigned below, the shallow copy shares the untouched ones with the dataset
+        result_df = self.dataset.copy(deep=False)
 
         if reports_df.empty:
             self.logger.warning("Reports dataframe is empty, returning original dataset")
             return result_df
 
-        # Create lookup from normalized report keys
-        reports_lookup = {}
-        for _, row in reports_df.iterrows():
-            key = (row['ID'], normalize_name(row['NAME']), str(row['VARIABLE']).upper())
-            reports_lookup[key] = {
-                'VALUE': row.get('VALUE'),
-                'CURRENCY': row.get('CURRENCY'),
-                'REFYEAR': row.get('REFYEAR'),
-                'SRC': row.get('SRC')
-            }
-
-        for idx, row in result_df.iterrows():
-            key = (row['ID'], normalize_name(row['NAME']), str(row['VARIABLE']).upper())
-            if key in reports_lookup:
-                report_data = reports_lookup[key]
-                for col in ['VALUE', 'CURRENCY', 'REFYEAR', 'SRC']:
-                    if pd.isna(row[col]) or row[col] in ['', 'N/A']:
-                        if pd.notna(report_data.get(col)) and report_data[col] != '':
-                            result_df.at[idx, col] = report_data[col]
+        # Align the reports to the dataset rows on the normalized keys, the last report of a key wins
+        for col in ['VALUE', 'CURRENCY', 'REFYEAR', 'SRC']:
+            if col not in reports_df.columns:
+                continue
+            report_values = self._report_column(reports_df, col, result_df.index)
+            missing = result_df[col].isna() | result_df[col].isin(['', 'N/A'])
+            available = report_values.notna() & (report_values != '')
+            result_df[col] = result_df[col].where(~(missing & available), report_values)
 
         return result_df
 
     def add_quality_metrics(self, df, reports_df):
         """Add quality and confidence metrics to the dataframe."""
-        df = df.copy()
+        # Only whole columns are assigned, the input frame is never written to
+        df = df.copy(deep=False)
 
         df['DATA_COMPLETENESS'] = 0.0
         df['CONFIDENCE_LEVEL'] = 'LOW'
@@ -191,87 +308,36 @@ class DataExtractionSubmission:
         df['HAS_SOURCE'] = False
 
         if not reports_df.empty and 'Page Status' in reports_df.columns:
-            page_status_map = {
-                (row['ID'], normalize_name(row['NAME']), str(row['VARIABLE']).upper()): row['Page Status']
-                for _, row in reports_df.iterrows()
-            }
-
-            for idx, row in df.iterrows():
-                key = (row['ID'], normalize_name(row['NAME']), str(row['VARIABLE']).upper())
-                if key in page_status_map:
-                    df.at[idx, 'PAGE_STATUS'] = page_status_map[key]
-
-        for idx, row in df.iterrows():
-            completeness_score = 0
-            confidence = 'LOW'
+            has_report = self._matched_report_rows(reports_df) >= 0
+            df['PAGE_STATUS'] = df['PAGE_STATUS'].where(~has_report, self._report_column(reports_df, 'Page Status', df.index))
+        # A handful of distinct statuses repeated on every row
+        df['PAGE_STATUS'] = df['PAGE_STATUS'].astype('category')
 
-            if pd.notna(row['VALUE']) and row['VALUE'] != '':
-                completeness_score += 0.4
-                confidence = 'MEDIUM'
-
-            if pd.notna(row['SRC']) and row['SRC'] != '':
-                completeness_score += 0.3
-                df.at[idx, 'HAS_SOURCE'] = True
-                if confidence == 'MEDIUM':
-                    confidence = 'HIGH'
-
-            if pd.notna(row['CURRENCY']) and row['CURRENCY'] != '':
-                completeness_score += 0.15
-
-            if pd.notna(row['REFYEAR']) and row['REFYEAR'] != '':
-                completeness_score += 0.15
-
-            if row['PAGE_STATUS'] == 'Page found':
-                completeness_score += 0.1
-                if completeness_score >= 0.7:
-                    confidence = 'HIGH'
-
-            df.at[idx, 'DATA_COMPLETENESS'] = min(completeness_score, 1.0)
-            df.at[idx, 'CONFIDENCE_LEVEL'] = confidence
+        df['HAS_SOURCE'] = is_filled(df['SRC'])
+        df['DATA_COMPLETENESS'], df['CONFIDENCE_LEVEL'] = score_quality(df, df['HAS_SOURCE'])
 
         return df
 
     def clean_submission_data(self, df):
         """Clean and validate data before submission."""
-        df = df.copy()
+        # Only whole columns are assigned, the input frame is never written to
+        df = df.copy(deep=False)
         
         # Clean SRC column
-        df['SRC'] = df['SRC'].apply(clean_src_column)
-        
+        df['SRC'] = clean_src_series(df['SRC'])
+
         # Clean REFYEAR column
-        df['REFYEAR'] = df['REFYEAR'].apply(clean_refyear_column)
-        
-        # Update HAS_SOURCE based on cleaned SRC
-        df['HAS_SOURCE'] = df['SRC'].apply(lambda x: bool(x and x.strip()))
-        
+        df['REFYEAR'] = clean_refyear_series(df['REFYEAR'])
+
+        # A few ISO codes repeated on every row, only categorical once the reports can no longer add new ones
+        df['CURRENCY'] = df['CURRENCY'].astype('category')
+
+        # Update HAS_SOURCE based on cleaned SRC, the valid URLs hold no whitespace
+        df['HAS_SOURCE'] = df['SRC'] != ''
+
         # Recalculate confidence levels based on cleaned data
-        for idx, row in df.iterrows():
-            completeness_score = 0
-            confidence = 'LOW'
-            
-            if pd.notna(row['VALUE']) and row['VALUE'] != '':
-                completeness_score += 0.4
-                confidence = 'MEDIUM'
-            
-            if row['HAS_SOURCE']:
-                completeness_score += 0.3
-                if confidence == 'MEDIUM':
-                    confidence = 'HIGH'
-            
-            if pd.notna(row['CURRENCY']) and row['CURRENCY'] != '':
-                completeness_score += 0.15
-            
-            if pd.notna(row['REFYEAR']) and row['REFYEAR'] != '':
-                completeness_score += 0.15
-            
-            if row['PAGE_STATUS'] == 'Page found':
-                completeness_score += 0.1
-                if completeness_score >= 0.7:
-                    confidence = 'HIGH'
-            
-            df.at[idx, 'DATA_COMPLETENESS'] = min(completeness_score, 1.0)
-            df.at[idx, 'CONFIDENCE_LEVEL'] = confidence
-        
+        df['DATA_COMPLETENESS'], df['CONFIDENCE_LEVEL'] = score_quality(df, df['HAS_SOURCE'])
+
         return df
 
     def generate_summary_statistics(self, df):
@@ -279,14 +345,16 @@ class DataExtractionSubmission:
         summary = {
             'total_records': len(df),
             'unique_companies': df['ID'].nunique(),
-            'variables_coverage': df.groupby('VARIABLE').agg({
-                'VALUE': lambda x: (pd.notna(x) & (x != '')).sum(),
-                'ID': 'count'
-            }).rename(columns={'VALUE': 'filled_count', 'ID': 'total_count'}),
-            'confidence_distribution': df['CONFIDENCE_LEVEL'].value_counts(),
-            'page_status_distribution': df['PAGE_STATUS'].value_counts(),
+            # Built-in reductions over a precomputed mask, no Python callback per group
+            'variables_coverage': df.assign(_filled=is_filled(df['VALUE'])).groupby('VARIABLE', observed=True).agg(
+                filled_count=('_filled', 'sum'),
+                total_count=('ID', 'count'),
+            ),
+            # The categorical columns also count their unused categories, only the levels present are reported
+            'confidence_distribution': df['CONFIDENCE_LEVEL'].value_counts().loc[lambda counts: counts > 0],
+            'page_status_distribution': df['PAGE_STATUS'].value_counts().loc[lambda counts: counts > 0],
             'average_completeness': df['DATA_COMPLETENESS'].mean(),
-            'companies_with_sources': df[df['HAS_SOURCE']]['ID'].nunique(),
+            'companies_with_sources': df.loc[df['HAS_SOURCE'], 'ID'].nunique(),
             'invalid_urls_cleaned': 0  # Will be updated during cleaning
         }
 
@@ -302,10 +370,10 @@ class DataExtractionSubmission:
         self.logger.info("Starting data population process...")
 
         reports_df = self.load_reports_data()
-        self.logger.info(f"Loaded {len(reports_df)} report records")
+        self.logger.info("Loaded %d report records", len(reports_df))
 
         merged_df = self.merge_with_original_data(reports_df)
-        self.logger.info(f"Merged data contains {len(merged_df)} records")
+        self.logger.info("Merged data contains %d records", len(merged_df))
 
         processed_df = self.add_quality_metrics(merged_df, reports_df)
         
@@ -313,9 +381,10 @@ class DataExtractionSubmission:
         cleaned_df = self.clean_submission_data(processed_df)
         
         self.processed_data = cleaned_df
+        self._row_positions = {}
 
         summary = self.generate_summary_statistics(cleaned_df)
-        self.logger.info(f"Data processing complete. Coverage: {summary['average_completeness']:.2%}")
+        self.logger.info("Data processing complete. Coverage: %.2f%%", summary["average_completeness"] * 100)
 
         return cleaned_df, summary
 
@@ -333,47 +402,35 @@ class DataExtractionSubmission:
 
         try:
             submission_columns = ['ID', 'NAME', 'VARIABLE', 'SRC', 'VALUE', 'CURRENCY', 'REFYEAR']
-            submission_df = self.processed_data[submission_columns].copy()
+            # The column selection is a new frame already, the cleared values never reach processed_data
+            submission_df = self.processed_data[submission_columns]
             
             # Final validation: ensure no invalid URLs or non-numeric REFYEAR values in submission
-            invalid_urls = []
-            invalid_years = []
-            
-            for idx, row in submission_df.iterrows():
-                # Check SRC column
-                if row['SRC'] and not is_valid_url(row['SRC']):
-                    invalid_urls.append(f"ID: {row['ID']}, SRC: {row['SRC']}")
-                    submission_df.at[idx, 'SRC'] = ''  # Clear invalid URLs
-                
-                # Check REFYEAR column
-                if pd.notna(row['REFYEAR']):
-                    try:
-                        # Ensure it's a valid number
-                        year_val = float(row['REFYEAR'])
-                        if not (1800 <= year_val <= 2030):  # Reasonable year range
-                            invalid_years.append(f"ID: {row['ID']}, REFYEAR: {row['REFYEAR']}")
-                            submission_df.at[idx, 'REFYEAR'] = None
-                    except (ValueError, TypeError):
-                        invalid_years.append(f"ID: {row['ID']}, REFYEAR: {row['REFYEAR']}")
-                        submission_df.at[idx, 'REFYEAR'] = None
-            
-            if invalid_urls:
-                self.logger.warning(f"Cleared {len(invalid_urls)} invalid URLs from submission data")
-            
-            if invalid_years:
-                self.logger.warning(f"Cleared {len(invalid_years)} invalid REFYEAR values from submission data")
+            src = submission_df['SRC']
+            invalid_urls = (src != '') & ~(src.notna() & src.astype(str).str.match(_URL_RE))
+            # Reasonable year range, the values that are not numbers are invalid too
+            refyear = submission_df['REFYEAR']
+            invalid_years = refyear.notna() & ~pd.to_numeric(refyear, errors='coerce').between(1800, 2030)
+
+            if invalid_urls.any():
+                submission_df.loc[invalid_urls, 'SRC'] = ''  # Clear invalid URLs
+                self.logger.warning("Cleared %d invalid URLs from submission data", invalid_urls.sum())
+
+            if invalid_years.any():
+                submission_df.loc[invalid_years, 'REFYEAR'] = None
+                self.logger.warning("Cleared %d invalid REFYEAR values from submission data", invalid_years.sum())
             
             submission_df.to_csv(output_path, sep=';', index=False)
 
             detailed_path = output_path.replace('.csv', '_detailed.csv')
             self.processed_data.to_csv(detailed_path, sep=';', index=False)
 
-            self.logger.info(f"Submission data saved to {output_path}")
-            self.logger.info(f"Detailed data saved to {detailed_path}")
+            self.logger.info("Submission data saved to %s", output_path)
+            self.logger.info("Detailed data saved to %s", detailed_path)
 
             return True
         except Exception as e:
-            self.logger.error(f"Error saving submission data: {e}")
+            self.logger.error("Error saving submission data: %s", e)
             return False
 
     def get_company_data(self, company_id):
@@ -381,14 +438,26 @@ class DataExtractionSubmission:
         if self.processed_data is None:
             self.logger.error("No processed data available.")
             return pd.DataFrame()
-        return self.processed_data[self.processed_data['ID'] == company_id].copy()
+        return self._rows_with(company_id, 'ID')
 
     def get_variable_summary(self, variable_name):
         """Get summary for a specific variable across all companies."""
         if self.processed_data is None:
             self.logger.error("No processed data available.")
             return pd.DataFrame()
-        return self.processed_data[self.processed_data['VARIABLE'] == variable_name].copy()
+        return self._rows_with(variable_name, 'VARIABLE')
+
+    def _rows_with(self, value, column):
+        """
+        Return the processed rows whose column holds the value, without scanning the whole column again.
+
+        The rows are taken by position into a new frame, changing it never alters `processed_data`.
+        """
+        positions = self._row_positions.get(column)
+        if positions is None:
+            positions = self.processed_data.groupby(column, observed=True, sort=False).indices
+            self._row_positions[column] = positions
+        return self.processed_data.iloc[positions.get(value, [])]
 
     def run(self, save_output=True, output_filename=None, verbose=True):
         """Main execution method that runs the complete data processing pipeline."""
@@ -1,16 +1,30 @@
 """Utility functions for data discovery and configuration management."""
 
+import functools
 import json
+import os
+import stat
+import tempfile
 from pathlib import Path
 from typing import Any
 
+import orjson
 import yaml
 
+# Mode of a file created with open(), the temporary files of `write_bytes_atomic` are created owner-only
+_umask = os.umask(0)
+os.umask(_umask)
+_NEW_FILE_MODE = 0o666 & ~_umask
 
+
+@functools.cache
 def load_config_yaml(config_path: str) -> dict[str, Any]:
     """
     Load a YAML configuration file.
 
+    The file is parsed once per process and the same dictionary is returned to every caller,
+    so it must be treated as read-only.
+
     Args:
         config_path (str): Path to the YAML configuration file.
 
@@ -24,21 +38,56 @@ def load_config_yaml(config_path: str) -> dict[str, Any]:
 
 def load_json_obj(file_path: str) -> dict:
     """Load a JSON object from a file."""
-    with Path(file_path).open("r") as f:
-        return json.load(f)
+    content = Path(file_path).read_bytes()
+    try:
+        return orjson.loads(content)
+    except orjson.JSONDecodeError:
+        # Files written by json.dump may contain NaN/Infinity, which only the standard decoder accepts
+        return json.loads(content)
+
+
+def load_jsonl_obj(file_path: str) -> list:
+    """Load the objects of a JSON Lines file, one per non-empty line."""
+    with Path(file_path).open("rb") as f:
+        return [orjson.loads(line) for line in f if line.strip()]
 
 
 def save_json_obj(obj: dict, file_path: str) -> None:
     """
-    Save a dictionary object to a YAML file.
+    Save a dictionary object to a JSON file.
 
     Args:
         obj (dict): The object to save.
         file_path (str): The path to the file where the object will be saved.
     """
-    with Path(file_path).open("w") as f:
-        # Prepare the data to save
-        json.dump(obj, f, indent=4)
+    write_bytes_atomic(orjson.dumps(obj, option=orjson.OPT_INDENT_2), file_path)
+
+
+def write_bytes_atomic(data: bytes, file_path: str | Path) -> None:
+    """
+    Replace the content of a file all at once.
+
+    The data is written to a temporary file of the same folder and renamed over the target, so a crash
+    in the middle of the write leaves the previous content intact. The file keeps the mode of the target.
+
+    Args:
+        data (bytes): The new content of the file.
+        file_path (str | Path): The path of the file to write.
+    """
+    path = Path(file_path)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        try:
+            mode = stat.S_IMODE(path.stat().st_mode)
+        except FileNotFoundError:
+            mode = _NEW_FILE_MODE
+        Path(tmp_path).chmod(mode)
+        Path(tmp_path).replace(path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
 
 
 def save_code(code: str, file_path: str) -> None: